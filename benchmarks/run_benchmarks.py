@@ -0,0 +1,309 @@
+"""
+Throughput and memory benchmarks for the library generation pipeline.
+
+Every benchmark is built from the belantamab scenario of mablibs.main and run
+across template lengths (the HCDR3 and the whole VH), numbers of randomized
+positions and restriction enzyme set sizes. Each one reports items per
+second, timed with time.perf_counter, and the peak memory allocated while it
+runs, measured with tracemalloc in a separate untimed run.
+
+Usage:
+
+    python -m benchmarks.run_benchmarks                       # print results
+    python -m benchmarks.run_benchmarks --save baseline.json  # save baseline
+    python -m benchmarks.run_benchmarks --compare baseline.json
+
+With --compare, the script exits with status 1 if any benchmark is slower
+than the baseline by more than --tolerance.
+"""
+
+import argparse
+import itertools as it
+import json
+import pathlib
+import platform
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+from typing import Callable, Dict, Iterator, List
+
+from mablibs import batches, enzymes, optimization
+from mablibs.design import CodonDesigner
+from mablibs.main import (
+    BELANTAMAB_VH_SEQ,
+    RESTRICTION_SITES,
+    belantamab_hcdr3_template,
+    to_nucleotides,
+)
+from mablibs.mutagenesis import Mutagenesis
+from mablibs.ptms import find_ptm_motifs
+from mablibs.strategies import RandomizationStrategy
+from mablibs.templates import Template
+
+SPECIES = "e_coli"
+POSITION_COUNTS = (4, 8)
+ENZYME_SET_SIZES = (1, 5, 20)
+
+# a benchmark runs setup once, then func, which returns the number of items
+# it processed
+Benchmark = namedtuple("Benchmark", "name setup func")
+Result = namedtuple("Result", "name items seconds items_per_second peak_kib")
+
+
+def templates() -> Dict[str, Template]:
+    return {
+        "hcdr3": belantamab_hcdr3_template(),
+        "vh": Template(to_nucleotides(BELANTAMAB_VH_SEQ.replace("-", ""))),
+    }
+
+
+def enzyme_set(size: int) -> List[str]:
+    others = (name for name in enzymes.ENZYMES if name not in RESTRICTION_SITES)
+    return list(it.islice(it.chain(RESTRICTION_SITES, others), size))
+
+
+def strategy(template: Template, n_positions: int) -> RandomizationStrategy:
+    substitutions = sorted(set(template.amino_acids) - {"C", "M"})
+    positions = range(0, 2 * n_positions, 2)
+    return RandomizationStrategy(
+        dict.fromkeys(positions, substitutions), n_positions // 2
+    )
+
+
+def constraints(enzyme_names: List[str]) -> List[Callable]:
+    return [
+        optimization.RestrictionSiteConstraint(*enzyme_names),
+        optimization.NucleotideRepeatConstraint(),
+        optimization.GCContentConstraint(threshold=0.75),
+        optimization.is_not_palindromic,
+    ]
+
+
+def variants(template: Template, n_positions: int, limit: int) -> List:
+    mutagenesis = Mutagenesis(
+        strategy(template, n_positions), template, SPECIES
+    )
+    mutations = list(
+        it.islice(mutagenesis.randomization_strategy.get_mutations(), limit)
+    )
+    return [mutagenesis.mutate(template, m) for m in mutations]
+
+
+def consume(iterator: Iterator) -> int:
+    count = 0
+    for count, _ in enumerate(iterator, 1):
+        pass
+    return count
+
+
+def library_size(randomization: RandomizationStrategy) -> int:
+    len(randomization)
+    return 1
+
+
+def reverse_translate(sequences: List[str], mode: str) -> int:
+    # counts residues rather than sequences
+    nucleotides = batches.reverse_translate(sequences, SPECIES, mode, seed=0)
+    return sum(map(len, nucleotides)) // 3
+
+
+def benchmarks() -> Iterator[Benchmark]:
+    for length, template in templates().items():
+        for n_positions in POSITION_COUNTS:
+            tag = f"{length}-positions{n_positions}"
+
+            def setup(template=template, n_positions=n_positions):
+                return strategy(template, n_positions)
+
+            yield Benchmark(
+                f"get_mutations[{tag}]",
+                setup,
+                lambda r: consume(it.islice(r.get_mutations(), 200_000)),
+            )
+            yield Benchmark(
+                f"sample[{tag}]",
+                setup,
+                lambda r: consume(r.sample(min(10_000, r.size()), seed=0)),
+            )
+            yield Benchmark(f"len[{tag}]", setup, library_size)
+
+            def mutagenesis_setup(template=template, n_positions=n_positions):
+                mutagenesis = Mutagenesis(
+                    strategy(template, n_positions), template, SPECIES
+                )
+                mutations = list(
+                    it.islice(
+                        mutagenesis.randomization_strategy.get_mutations(),
+                        20_000,
+                    )
+                )
+                return mutagenesis, mutations
+
+            yield Benchmark(
+                f"mutate[{tag}]",
+                mutagenesis_setup,
+                lambda args: consume(
+                    args[0].mutate(args[0].template, m) for m in args[1]
+                ),
+            )
+            yield Benchmark(
+                f"find_ptm_motifs[{tag}]",
+                lambda template=template, n_positions=n_positions: [
+                    t.amino_acids
+                    for t in variants(template, n_positions, 20_000)
+                ],
+                lambda sequences: consume(
+                    find_ptm_motifs(seq) for seq in sequences
+                ),
+            )
+
+        for mode in batches.REVERSE_TRANSLATION_MODES:
+            yield Benchmark(
+                f"reverse_translate[{length}-{mode}]",
+                lambda template=template: [template.amino_acids] * 10_000,
+                lambda sequences, mode=mode: reverse_translate(sequences, mode),
+            )
+
+        for n_enzymes in ENZYME_SET_SIZES:
+            tag = f"{length}-enzymes{n_enzymes}"
+
+            def constraint_setup(template=template, n_enzymes=n_enzymes):
+                return constraints(enzyme_set(n_enzymes)), [
+                    t.nucleotides for t in variants(template, 4, 5_000)
+                ]
+
+            for i, name in enumerate(
+                ("restriction_sites", "repeats", "gc_content", "palindrome")
+            ):
+                yield Benchmark(
+                    f"constraint_{name}[{tag}]",
+                    constraint_setup,
+                    lambda args, i=i: consume(
+                        args[0][i](seq) for seq in args[1]
+                    ),
+                )
+
+            def optimizer_setup(template=template, n_enzymes=n_enzymes):
+                optimizer = optimization.DNAOptimizer(
+                    constraints(enzyme_set(n_enzymes)),
+                    SPECIES,
+                    seed=0,
+                    max_iterations=200,
+                )
+                return optimizer, variants(template, 4, 50)
+
+            # optimize rather than optimize_template, so that variants that
+            # cannot be optimized are timed instead of raising
+            yield Benchmark(
+                f"optimize_template[{tag}]",
+                optimizer_setup,
+                lambda args: consume(args[0].optimize(t) for t in args[1]),
+            )
+
+            def designer_setup(template=template, n_enzymes=n_enzymes):
+                designer = CodonDesigner(
+                    constraints(enzyme_set(n_enzymes)), SPECIES
+                )
+                return designer, variants(template, 4, 50)
+
+            yield Benchmark(
+                f"design[{tag}]",
+                designer_setup,
+                lambda args: consume(args[0].optimize(t) for t in args[1]),
+            )
+
+
+def run(benchmark: Benchmark, repeat: int) -> Result:
+    state = benchmark.setup()
+    best, items = float("inf"), 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        items = benchmark.func(state)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        benchmark.func(state)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return Result(
+        benchmark.name,
+        items,
+        best,
+        items / best if best else float("inf"),
+        peak / 1024,
+    )
+
+
+def compare(
+    results: List[Result], baseline: Dict, tolerance: float
+) -> List[str]:
+    """
+    Returns a message for every benchmark whose throughput dropped by more
+    than tolerance relative to the baseline.
+    """
+    previous = {
+        result["name"]: result["items_per_second"]
+        for result in baseline["results"]
+    }
+    regressions = []
+    for result in results:
+        if result.name not in previous:
+            continue
+        ratio = result.items_per_second / previous[result.name]
+        if ratio < 1 - tolerance:
+            regressions.append(
+                f"{result.name}: {result.items_per_second:,.0f}/s is "
+                f"{1 - ratio:.0%} slower than {previous[result.name]:,.0f}/s"
+            )
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-k", default="", help="only run benchmarks matching")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", type=pathlib.Path, help="save results")
+    parser.add_argument("--compare", type=pathlib.Path, help="baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    results = []
+    print(f"{'benchmark':48} {'items/s':>14} {'peak KiB':>10}")
+    for benchmark in benchmarks():
+        if args.k not in benchmark.name:
+            continue
+        result = run(benchmark, args.repeat)
+        results.append(result)
+        print(
+            f"{result.name:48} {result.items_per_second:>14,.0f} "
+            f"{result.peak_kib:>10,.0f}"
+        )
+
+    if args.save is not None:
+        args.save.write_text(
+            json.dumps(
+                {
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "results": [result._asdict() for result in results],
+                },
+                indent=2,
+            )
+        )
+
+    if args.compare is not None:
+        regressions = compare(
+            results, json.loads(args.compare.read_text()), args.tolerance
+        )
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
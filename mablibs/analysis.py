@@ -0,0 +1,249 @@
+"""
+Module contains exact statistics of libraries, optionally filtered by a
+ptms.PTMChecker, computed by dynamic programming over the template positions
+instead of by enumerating the library.
+
+PTM motifs are at most a few residues long, so whether a variant contains a
+motif can be decided left to right while remembering only the recent
+residues that could still begin a motif. The dynamic program walks the
+template, keeping the number of partial variants for every (positions
+selected for mutation, residues changed from the parent, motif context)
+state. Its cost grows with the template length and the number of randomized
+positions and residues, not with the library size.
+"""
+
+import collections
+import re
+from typing import Dict, FrozenSet, List, Tuple, Union
+
+from mablibs import codons
+
+AMINO_ACIDS = "".join(codons.AA2CODON)
+
+# exact statistics of a library:
+#   size: number of members of the unfiltered library
+#   n_passing: number of members without an excluded PTM motif
+#   residue_counts: {position: {residue: number of passing members}} for
+#       every randomized position, including members leaving it unchanged
+#   mutation_counts: mutation_counts[m] is the number of passing members
+#       whose amino acid sequence differs from the parent at m positions
+LibraryStatistics = collections.namedtuple(
+    "LibraryStatistics", "size n_passing residue_counts mutation_counts"
+)
+
+State = Tuple[int, int, str]
+
+
+def _motif_classes(pattern: str) -> List[FrozenSet[str]]:
+    """
+    Returns the residues allowed at each position of a motif pattern made of
+    residues and (negated) character classes, e.g.
+    "N[^P][ST]" -> [{N}, {A, C, ...}, {S, T}]
+    """
+    classes = []
+    for token in re.findall(r"\[\^?[^\]]*\]|.", pattern):
+        if token == ".":
+            classes.append(frozenset(AMINO_ACIDS))
+        elif token.startswith("[^"):
+            classes.append(frozenset(AMINO_ACIDS) - set(token[2:-1]))
+        elif token.startswith("["):
+            classes.append(frozenset(token[1:-1]))
+        else:
+            classes.append(frozenset(token))
+    return classes
+
+
+class _MotifContext:
+    """
+    Transition function of the motif context: the longest suffix of the
+    residues so far that could be the start of an excluded motif. Any motif
+    ending at the next residue starts within the context, so the context is
+    all that is needed to decide exclusion, and there are few contexts.
+    """
+
+    def __init__(self, ptm_checker) -> None:
+        self.motif_rules = (
+            () if ptm_checker is None else ptm_checker.motif_rules
+        )
+        self._classes = [
+            _motif_classes(regex.pattern) for regex, _ in self.motif_rules
+        ]
+        self._transitions: Dict[Tuple[str, str], Union[None, str]] = {}
+
+    def _is_motif_prefix(self, residues: str) -> bool:
+        return any(
+            len(residues) < len(classes)
+            and all(map(frozenset.__contains__, classes, residues))
+            for classes in self._classes
+        )
+
+    def step(self, context: str, residue: str) -> Union[None, str]:
+        """
+        Returns the context after residue, or None if residue completes an
+        excluded motif.
+        """
+        key = context, residue
+        if key not in self._transitions:
+            window = context + residue
+            if _is_excluded(window, self.motif_rules):
+                self._transitions[key] = None
+            else:
+                start = 0
+                while start < len(window) and not self._is_motif_prefix(
+                    window[start:]
+                ):
+                    start += 1
+                self._transitions[key] = window[start:]
+        return self._transitions[key]
+
+
+def _choices(strategy, parent: str) -> List[Tuple[Tuple[str, bool], ...]]:
+    """
+    Returns, for every template position, the (residue, is_mutated) options
+    a library member can have there.
+    """
+    mapping = strategy.position_residue_mapping
+    if any(not 0 <= position < len(parent) for position in mapping):
+        raise ValueError("randomized positions must lie within the template")
+
+    choices = [((residue, False),) for residue in parent]
+    for position, residues in mapping.items():
+        choices[position] += tuple((residue, True) for residue in residues)
+    return choices
+
+
+def _is_excluded(window: str, motif_rules) -> bool:
+    """
+    Returns True if a motif ends at the last residue of window.
+    """
+    return any(
+        len(window) >= length and regex.fullmatch(window, len(window) - length)
+        for regex, length in motif_rules
+    )
+
+
+def _forward(strategy, parent: str, ptm_checker) -> List[Dict[State, int]]:
+    """
+    Returns, before the first and after every template position, the number
+    of partial variants passing ptm_checker by (positions selected, residues
+    changed, motif context) state.
+    """
+    context = _MotifContext(ptm_checker)
+    choices = _choices(strategy, parent)
+
+    counts = [{(0, 0, ""): 1}]
+    for position, options in enumerate(choices):
+        next_counts = collections.defaultdict(int)
+        for (n_selected, n_changed, motif_context), count in counts[-1].items():
+            for residue, is_mutated in options:
+                n = n_selected + is_mutated
+                if n > strategy.n:
+                    continue
+                next_context = context.step(motif_context, residue)
+                if next_context is None:
+                    continue
+                changed = n_changed + (residue != parent[position])
+                next_counts[n, changed, next_context] += count
+        counts.append(dict(next_counts))
+    return counts
+
+
+def count_passing(strategy, ptm_checker) -> int:
+    """
+    Returns the number of members of a RandomizationStrategy's library that
+    contain no motif excluded by ptm_checker.
+    """
+    counts = _forward(strategy, ptm_checker.parent, ptm_checker)[-1]
+    return sum(
+        count
+        for (n_selected, _, _), count in counts.items()
+        if n_selected == strategy.n
+    )
+
+
+def library_statistics(
+    strategy, parent: str, ptm_checker=None
+) -> LibraryStatistics:
+    """
+    Computes exact LibraryStatistics of a RandomizationStrategy's library.
+
+    A forward pass counts the partial variants reaching each state and a
+    backward pass counts the ways of completing a variant from each state,
+    so the number of passing members with a given residue at a position is
+    the sum over transitions of forward count times backward count.
+
+    Args:
+        strategy (RandomizationStrategy): the library
+        parent (str): amino acid sequence of the template
+        ptm_checker (Union[None, PTMChecker]): if given, members with a motif
+        it excludes are left out of the statistics
+
+    Returns:
+        LibraryStatistics: library statistics
+    """
+    if ptm_checker is not None and ptm_checker.parent != parent:
+        raise ValueError("ptm_checker was created for a different template")
+
+    context = _MotifContext(ptm_checker)
+    choices = _choices(strategy, parent)
+    forward = _forward(strategy, parent, ptm_checker)
+
+    # completions of a (positions selected, motif context) state into a
+    # member selecting exactly strategy.n positions; the number of changed
+    # residues does not affect the completions
+    backward = {
+        (n_selected, motif_context): int(n_selected == strategy.n)
+        for n_selected, _, motif_context in forward[-1]
+    }
+    residue_counts = {}
+    for position in reversed(range(len(parent))):
+        states = {
+            (n_selected, motif_context)
+            for n_selected, _, motif_context in forward[position]
+        }
+        previous = collections.defaultdict(int)
+        for n_selected, motif_context in states:
+            for residue, is_mutated in choices[position]:
+                n = n_selected + is_mutated
+                if n > strategy.n:
+                    continue
+                next_context = context.step(motif_context, residue)
+                if next_context is not None:
+                    previous[n_selected, motif_context] += backward[
+                        n, next_context
+                    ]
+
+        if position in strategy.position_residue_mapping:
+            arriving = collections.defaultdict(int)
+            for (n_selected, _, motif_context), count in forward[
+                position
+            ].items():
+                arriving[n_selected, motif_context] += count
+            counts = collections.defaultdict(int)
+            for (n_selected, motif_context), count in arriving.items():
+                for residue, is_mutated in choices[position]:
+                    n = n_selected + is_mutated
+                    if n > strategy.n:
+                        continue
+                    next_context = context.step(motif_context, residue)
+                    if next_context is not None:
+                        counts[residue] += count * backward[n, next_context]
+            residue_counts[position] = {
+                residue: count for residue, count in counts.items() if count
+            }
+        backward = previous
+
+    mutation_counts = [0] * (strategy.n + 1)
+    for (n_selected, n_changed, _), count in forward[-1].items():
+        if n_selected == strategy.n:
+            mutation_counts[n_changed] += count
+
+    return LibraryStatistics(
+        strategy.size(),
+        sum(mutation_counts),
+        {
+            position: residue_counts[position]
+            for position in strategy.position_residue_mapping
+        },
+        mutation_counts,
+    )
@@ -0,0 +1,255 @@
+"""
+Module contains vectorised counterparts of the per-variant functions, working
+on batches of variants encoded as integer arrays (see mablibs.encoding).
+"""
+
+from typing import Dict, Iterable, List, Union
+
+import numpy as np
+
+from mablibs import encoding
+from mablibs.codon_tables import get_codon_table
+from mablibs.strategies import UNMUTATED, RandomizationStrategy
+from mablibs.templates import Template
+
+
+def mutate_batch(
+    template: Template,
+    randomization_strategy: RandomizationStrategy,
+    residue_batch: np.ndarray,
+    aa2codon: Dict[str, str],
+) -> np.ndarray:
+    """
+    Applies a batch of mutations to a template.
+
+    Args:
+        template (Template): the parent template
+        randomization_strategy (RandomizationStrategy): the strategy the
+        residue batch was generated from
+        residue_batch (np.ndarray): (batch, n_positions) residue indices, as
+        returned by RandomizationStrategy.get_residue_batches
+        aa2codon (Dict[str, str]): codon used for each substituted amino acid
+
+    Returns:
+        np.ndarray: (batch, n_codons) uint8 matrix of codon indices
+    """
+    parent = encoding.encode_codons(template.nucleotides)
+    codon_matrix = np.repeat(parent[np.newaxis, :], len(residue_batch), axis=0)
+    mapping = randomization_strategy.position_residue_mapping
+    for column, (position, residues) in enumerate(mapping.items()):
+        lookup = np.full(UNMUTATED + 1, parent[position], dtype=np.uint8)
+        lookup[: len(residues)] = [
+            encoding.CODON_INDEX[aa2codon[residue]] for residue in residues
+        ]
+        codon_matrix[:, position] = lookup[residue_batch[:, column]]
+    return codon_matrix
+
+
+def translate_batch(codon_matrix: np.ndarray) -> np.ndarray:
+    """
+    Translates a (batch, n_codons) codon index matrix into a matrix of amino
+    acid indices of the same shape. Stop codons translate to
+    encoding.UNKNOWN.
+    """
+    return encoding.CODON_TO_AMINO_ACID[codon_matrix]
+
+
+def to_templates(codon_matrix: np.ndarray) -> List[Template]:
+    """
+    Converts a (batch, n_codons) codon index matrix back into Templates.
+    """
+    return [Template(encoding.decode_codons(row)) for row in codon_matrix]
+
+
+REVERSE_TRANSLATION_MODES = ("most_frequent", "weighted", "harmonized")
+
+# fractional part of the golden ratio; frac(k * _GOLDEN) spreads the
+# occurrences of an amino acid evenly over [0, 1)
+_GOLDEN = (5**0.5 - 1) / 2
+
+
+def _occurrences(amino_acids: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """
+    Returns, for each element of a flat amino acid index array, how many
+    times its amino acid occurs before it in the same row.
+    """
+    keys = rows.astype(np.int64) * len(encoding.AMINO_ACIDS) + amino_acids
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    sizes = np.diff(np.r_[starts, len(keys)])
+    occurrences = np.empty(len(keys), dtype=np.int64)
+    occurrences[order] = np.arange(len(keys)) - np.repeat(starts, sizes)
+    return occurrences
+
+
+def _reverse_translate(
+    amino_acids: np.ndarray,
+    rows: np.ndarray,
+    species: str,
+    mode: str,
+    seed,
+) -> np.ndarray:
+    if mode not in REVERSE_TRANSLATION_MODES:
+        raise ValueError(
+            f"mode must be one of {', '.join(REVERSE_TRANSLATION_MODES)}"
+        )
+    if (amino_acids >= len(encoding.AMINO_ACIDS)).any():
+        raise ValueError("amino acid indices must index encoding.AMINO_ACIDS")
+
+    table = get_codon_table(species)
+    if mode == "most_frequent":
+        return table.preferred[amino_acids]
+    if mode == "weighted":
+        return table.sample_codons(amino_acids, np.random.default_rng(seed))
+
+    u = (_occurrences(amino_acids, rows) * _GOLDEN) % 1
+    columns = np.count_nonzero(
+        table.cumulative[amino_acids] <= u[:, np.newaxis], axis=1
+    )
+    columns = np.minimum(columns, table.group_sizes[amino_acids] - 1)
+    return table.ranked_codons[amino_acids, columns]
+
+
+def reverse_translate_batch(
+    amino_acid_matrix: np.ndarray,
+    species: str,
+    mode: str = "most_frequent",
+    seed: Union[None, int, np.random.Generator] = None,
+) -> np.ndarray:
+    """
+    Reverse translates a (batch, n_residues) amino acid index matrix (see
+    encoding.encode_amino_acids) into a codon index matrix of the same
+    shape, using the codon usage of species.
+
+    Args:
+        amino_acid_matrix (np.ndarray): amino acid indices
+        species (str): species whose codon usage is used
+        mode (str): how codons are chosen:
+            most_frequent: the most frequent codon of each amino acid
+            weighted: codons drawn at random, weighted by usage
+            harmonized: deterministic, the codons of each amino acid appear
+                in each row in proportion to their usage, starting with the
+                most frequent one
+        seed (Union[None, int, np.random.Generator]): random number
+            generator or its seed, used by the weighted mode
+
+    Returns:
+        np.ndarray: (batch, n_residues) codon index matrix
+    """
+    amino_acid_matrix = np.asarray(amino_acid_matrix, dtype=np.uint8)
+    batch, n_residues = amino_acid_matrix.shape
+    rows = np.repeat(np.arange(batch), n_residues)
+    return _reverse_translate(
+        amino_acid_matrix.ravel(), rows, species, mode, seed
+    ).reshape(batch, n_residues)
+
+
+def reverse_translate(
+    sequences: Iterable[str],
+    species: str,
+    mode: str = "most_frequent",
+    seed: Union[None, int, np.random.Generator] = None,
+) -> List[str]:
+    """
+    Reverse translates amino acid sequences of any lengths into nucleotide
+    sequences in one vectorised pass, see reverse_translate_batch for the
+    arguments.
+    """
+    sequences = list(sequences)
+    lengths = np.array([len(seq) for seq in sequences], dtype=np.int64)
+    amino_acids = encoding.encode_amino_acids("".join(sequences))
+    rows = np.repeat(np.arange(len(sequences)), lengths)
+    nucleotides = encoding.decode_codons(
+        _reverse_translate(amino_acids, rows, species, mode, seed)
+    )
+    ends = 3 * np.cumsum(lengths)
+    return [
+        nucleotides[end - 3 * length : end]
+        for end, length in zip(ends.tolist(), lengths.tolist())
+    ]
+
+
+# nucleotide indices of each codon index, (64, 3)
+_CODON_NUCLEOTIDES = np.array(
+    [
+        [encoding.NUCLEOTIDES.index(nucleotide) for nucleotide in codon]
+        for codon in encoding.CODONS
+    ],
+    dtype=np.uint8,
+)
+_C, _G = encoding.NUCLEOTIDES.index("C"), encoding.NUCLEOTIDES.index("G")
+
+
+def to_nucleotide_matrix(codon_matrix: np.ndarray) -> np.ndarray:
+    """
+    Converts a (batch, n_codons) codon index matrix into a
+    (batch, 3 * n_codons) matrix of nucleotide indices.
+    """
+    codon_matrix = np.asarray(codon_matrix)
+    return _CODON_NUCLEOTIDES[codon_matrix].reshape(len(codon_matrix), -1)
+
+
+def _any_window(matches: np.ndarray, width: int) -> np.ndarray:
+    """
+    Returns, for each row of a boolean matrix, whether it has width
+    consecutive True values. The runs are found by and-ing shifted views of
+    the matrix, which for the short widths used here is faster than a
+    cumulative sum.
+    """
+    if width <= 0:
+        return np.ones(len(matches), dtype=bool)
+    n_windows = matches.shape[1] - width + 1
+    if n_windows <= 0:
+        return np.zeros(len(matches), dtype=bool)
+    runs = matches[:, :n_windows].copy()
+    for shift in range(1, width):
+        runs &= matches[:, shift : shift + n_windows]
+    return runs.any(axis=1)
+
+
+def gc_content_mask(
+    nucleotide_matrix: np.ndarray, threshold: float = 0.65
+) -> np.ndarray:
+    """
+    Vectorised is_below_gc_content_threshold: returns a boolean mask of the
+    rows of a (batch, length) nucleotide index matrix whose GC content is at
+    most threshold.
+    """
+    gc = np.count_nonzero(
+        (nucleotide_matrix == _C) | (nucleotide_matrix == _G), axis=1
+    )
+    return gc / nucleotide_matrix.shape[1] <= threshold
+
+
+def homopolymer_mask(
+    nucleotide_matrix: np.ndarray, max_run: int = 3
+) -> np.ndarray:
+    """
+    Returns a boolean mask of the rows without a run of more than max_run
+    identical nucleotides.
+    """
+    same = nucleotide_matrix[:, 1:] == nucleotide_matrix[:, :-1]
+    return ~_any_window(same, max_run)
+
+
+def dinucleotide_repeat_mask(
+    nucleotide_matrix: np.ndarray, max_repeats: int = 3
+) -> np.ndarray:
+    """
+    Returns a boolean mask of the rows without a dinucleotide repeated more
+    than max_repeats times in a row.
+    """
+    same = nucleotide_matrix[:, 2:] == nucleotide_matrix[:, :-2]
+    return ~_any_window(same, 2 * max_repeats)
+
+
+def repeat_mask(nucleotide_matrix: np.ndarray) -> np.ndarray:
+    """
+    Vectorised NucleotideRepeatConstraint: returns a boolean mask of the rows
+    with no run of 4 or more identical nucleotides and no dinucleotide
+    repeated 4 or more times.
+    """
+    return homopolymer_mask(nucleotide_matrix) & dinucleotide_repeat_mask(
+        nucleotide_matrix
+    )
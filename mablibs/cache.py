@@ -0,0 +1,225 @@
+"""
+Module contains a cache of optimized DNA keyed by amino acid sequence, so
+that variants translating to the same protein, and repeated runs of the same
+design, are only optimized once.
+
+OptimizationCache is a bounded LRU cache in memory, optionally backed by an
+sqlite database that is shared between processes and sessions.
+CachedOptimizer puts a cache in front of a DNAOptimizer and can be used
+wherever the optimizer is, e.g. as the optimizer of a Mutagenesis.
+"""
+
+import collections
+import hashlib
+import json
+import pathlib
+import sqlite3
+import threading
+from typing import Callable, Iterable, Union
+
+from mablibs.optimization import (
+    DNAOptimizer,
+    OptimizationError,
+    OptimizationResult,
+)
+from mablibs.templates import Template
+
+CacheInfo = collections.namedtuple(
+    "CacheInfo", "hits misses disk_hits maxsize currsize"
+)
+
+
+def constraint_fingerprint(constraints: Iterable[Callable]) -> str:
+    """
+    Returns a string identifying a set of constraints. Constraint instances
+    are identified by their repr, which includes their parameters, and
+    plain functions by their qualified name.
+    """
+    return ";".join(
+        (
+            f"{constraint.__module__}.{constraint.__qualname__}"
+            if hasattr(constraint, "__qualname__")
+            else repr(constraint)
+        )
+        for constraint in constraints
+    )
+
+
+class OptimizationCache:
+    """
+    Bounded LRU cache mapping keys to optimized nucleotide sequences,
+    optionally backed by an sqlite database. Entries evicted from memory are
+    kept in the database, and lookups that miss in memory fall back to it.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 100_000,
+        path: Union[None, str, pathlib.Path] = None,
+    ) -> None:
+        """
+        Args:
+            maxsize (int): maximum number of entries kept in memory
+            path (Union[None, str, pathlib.Path]): sqlite database to store
+            entries in, created if it does not exist
+        """
+        self.maxsize = maxsize
+        self.path = None if path is None else pathlib.Path(path)
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _database(self) -> sqlite3.Connection:
+        # opened lazily, so that the cache can be sent to worker processes
+        if self._connection is None:
+            self._connection = sqlite3.connect(
+                self.path, timeout=60, check_same_thread=False
+            )
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS optimized "
+                "(key TEXT PRIMARY KEY, nucleotides TEXT NOT NULL)"
+            )
+            self._connection.commit()
+        return self._connection
+
+    def get(self, key: str) -> Union[None, str]:
+        """
+        Returns the nucleotides stored under key, or None.
+        """
+        with self._lock:
+            nucleotides = self._entries.get(key)
+            if nucleotides is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return nucleotides
+
+            if self.path is not None:
+                row = (
+                    self._database()
+                    .execute(
+                        "SELECT nucleotides FROM optimized WHERE key = ?",
+                        (key,),
+                    )
+                    .fetchone()
+                )
+                if row is not None:
+                    self.hits += 1
+                    self.disk_hits += 1
+                    self._remember(key, row[0])
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, nucleotides: str) -> None:
+        with self._lock:
+            self._remember(key, nucleotides)
+            if self.path is not None:
+                database = self._database()
+                database.execute(
+                    "INSERT OR REPLACE INTO optimized VALUES (?, ?)",
+                    (key, nucleotides),
+                )
+                database.commit()
+
+    def _remember(self, key: str, nucleotides: str) -> None:
+        self._entries[key] = nucleotides
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def info(self) -> CacheInfo:
+        return CacheInfo(
+            self.hits,
+            self.misses,
+            self.disk_hits,
+            self.maxsize,
+            len(self._entries),
+        )
+
+    def clear(self) -> None:
+        """
+        Empties the in-memory cache and resets the counters. The database is
+        left untouched.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.disk_hits = 0
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_lock"] = None
+        state["_connection"] = None
+        return state
+
+    def __setstate__(self, state) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
+class CachedOptimizer:
+    """
+    Wraps a DNAOptimizer so that each amino acid sequence is only optimized
+    once. Entries are keyed by (amino acid sequence, constraint fingerprint,
+    species, seed), so optimizers with different settings can share a cache
+    database. Only successful optimizations are cached.
+    """
+
+    def __init__(
+        self,
+        optimizer: DNAOptimizer,
+        cache: Union[None, OptimizationCache] = None,
+    ) -> None:
+        self.optimizer = optimizer
+        self.cache = OptimizationCache() if cache is None else cache
+        self._fingerprint = constraint_fingerprint(optimizer.constraints)
+
+    def key(self, template: Template, seed: Union[None, int] = None) -> str:
+        return hashlib.sha256(
+            json.dumps(
+                [
+                    template.amino_acids,
+                    self._fingerprint,
+                    self.optimizer.species.upper(),
+                    self.optimizer.seed if seed is None else seed,
+                ]
+            ).encode("utf-8")
+        ).hexdigest()
+
+    def optimize(
+        self, template: Template, seed: Union[None, int] = None
+    ) -> OptimizationResult:
+        """
+        Like DNAOptimizer.optimize, but returns the cached sequence for
+        the template's amino acid sequence and seed if there is one. Cached
+        results report 0 iterations.
+        """
+        key = self.key(template, seed)
+        nucleotides = self.cache.get(key)
+        if nucleotides is not None:
+            if nucleotides != template.nucleotides:
+                template = Template(nucleotides)
+            return OptimizationResult(template, True, 0, ())
+
+        result = self.optimizer.optimize(template, seed)
+        if result.success:
+            self.cache.put(key, result.template.nucleotides)
+        return result
+
+    def optimize_template(self, template: Template) -> Template:
+        result = self.optimize(template)
+        if not result.success:
+            raise OptimizationError(result)
+        return result.template
@@ -0,0 +1,192 @@
+"""
+Module contains CodonTable, a per-species codon usage table compiled once
+from codons.CODON_FREQUENCIES into arrays indexed by codon index (see
+mablibs.encoding), with Walker alias tables so that a synonymous codon can
+be drawn, weighted by usage, in O(1) and without allocating.
+"""
+
+import functools
+import random
+from typing import Tuple
+
+import numpy as np
+
+from mablibs import codons, encoding
+
+
+def _alias_table(weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Builds the acceptance probabilities and aliases of Vose's alias method
+    for drawing index i with probability weights[i] / sum(weights).
+    """
+    n = len(weights)
+    scaled = weights * n / weights.sum()
+    probability = np.ones(n)
+    alias = np.arange(n)
+    small = [i for i in range(n) if scaled[i] < 1]
+    large = [i for i in range(n) if scaled[i] >= 1]
+    while small and large:
+        s, l = small.pop(), large.pop()
+        probability[s], alias[s] = scaled[s], l
+        scaled[l] -= 1 - scaled[s]
+        (small if scaled[l] < 1 else large).append(l)
+    return probability, alias
+
+
+class CodonTable:
+    """
+    Codon usage of a species compiled into arrays.
+
+    Attributes:
+        species (str): species name, as in codons.CODON_FREQUENCIES
+        frequencies (np.ndarray): usage of each of the 64 codons
+        amino_acids (np.ndarray): amino acid index of each codon, or
+            encoding.UNKNOWN for stop codons
+        group_sizes (np.ndarray): number of synonymous codons of each amino
+            acid, indexed like encoding.AMINO_ACIDS
+        group_codons (np.ndarray): (amino acids, max synonyms) codon indices
+            of each amino acid, padded with the first codon
+        probability, alias (np.ndarray): alias tables of each amino acid,
+            shaped like group_codons
+        preferred (np.ndarray): most frequent codon of each amino acid
+        ranked_codons (np.ndarray): group_codons sorted from most to least
+            frequent, padded with the least frequent codon
+        cumulative (np.ndarray): cumulative usage of ranked_codons, padded
+            with 1
+    """
+
+    def __init__(self, species: str) -> None:
+        self.species = species.upper()
+        usage = codons.CODON_FREQUENCIES[self.species]
+        self.frequencies = np.array(
+            [usage.get(codon, 0.0) for codon in encoding.CODONS]
+        )
+        self.amino_acids = encoding.CODON_TO_AMINO_ACID
+
+        groups = [
+            [encoding.CODON_INDEX[codon] for codon in synonyms]
+            for synonyms in codons.AA2CODON.values()
+        ]
+        width = max(len(group) for group in groups)
+        self.group_sizes = np.array([len(group) for group in groups])
+        self.group_codons = np.array(
+            [group + [group[0]] * (width - len(group)) for group in groups],
+            dtype=np.uint8,
+        )
+        self.probability = np.ones((len(groups), width))
+        self.alias = np.zeros((len(groups), width), dtype=np.uint8)
+        for i, group in enumerate(groups):
+            probability, alias = _alias_table(self.frequencies[group])
+            self.probability[i, : len(group)] = probability
+            self.alias[i, : len(group)] = alias
+
+        self.ranked_codons = np.empty_like(self.group_codons)
+        self.cumulative = np.ones((len(groups), width))
+        for i, group in enumerate(groups):
+            ranked = sorted(group, key=lambda c: -self.frequencies[c])
+            weights = self.frequencies[ranked]
+            self.ranked_codons[i] = ranked + [ranked[-1]] * (width - len(group))
+            self.cumulative[i, : len(group)] = weights.cumsum() / weights.sum()
+        self.preferred = self.ranked_codons[:, 0].copy()
+
+        # plain Python copies for the scalar sampler, which is called once
+        # per optimizer iteration and is faster without NumPy scalars
+        self._groups = [
+            (
+                tuple(encoding.CODONS[codon] for codon in group),
+                tuple(self.probability[i, : len(group)].tolist()),
+                tuple(self.alias[i, : len(group)].tolist()),
+            )
+            for i, group in enumerate(groups)
+        ]
+        self._group_of = {
+            codon: self._groups[i]
+            for i, synonyms in enumerate(codons.AA2CODON.values())
+            for codon in synonyms
+        }
+
+    def synonyms(self, codon: str) -> Tuple[str, ...]:
+        """
+        Returns the codons encoding the same amino acid as codon, including
+        codon itself.
+        """
+        try:
+            return self._group_of[codon][0]
+        except KeyError:
+            raise NotImplementedError("codon not in synonymous codons")
+
+    def sample(self, codon: str, rng: random.Random) -> str:
+        """
+        Draws a codon synonymous with codon, weighted by usage, in O(1).
+
+        Args:
+            codon (str): codon to resample
+            rng (random.Random): random number generator
+        """
+        try:
+            synonyms, probability, alias = self._group_of[codon]
+        except KeyError:
+            raise NotImplementedError("codon not in synonymous codons")
+        # one uniform draw picks the column and, from its fractional part,
+        # whether to take the column or its alias
+        x = rng.random() * len(synonyms)
+        i = int(x)
+        return synonyms[i if x - i < probability[i] else alias[i]]
+
+    def sample_batch(
+        self, codon_indices: np.ndarray, rng: np.random.Generator
+    ) -> np.ndarray:
+        """
+        Resamples an array of codon indices, of any shape, to synonymous
+        codons weighted by usage. Stop codons are left unchanged.
+
+        Args:
+            codon_indices (np.ndarray): codon indices
+            rng (np.random.Generator): random number generator
+
+        Returns:
+            np.ndarray: uint8 codon indices of the same shape
+        """
+        codon_indices = np.asarray(codon_indices, dtype=np.uint8)
+        groups = self.amino_acids[codon_indices]
+        stop = groups == encoding.UNKNOWN
+        return np.where(
+            stop,
+            codon_indices,
+            self.sample_codons(np.where(stop, 0, groups), rng),
+        ).astype(np.uint8)
+
+    def sample_codons(
+        self, amino_acid_indices: np.ndarray, rng: np.random.Generator
+    ) -> np.ndarray:
+        """
+        Draws a codon for each of an array of amino acid indices, weighted
+        by usage.
+
+        Args:
+            amino_acid_indices (np.ndarray): amino acid indices, see
+                encoding.AMINO_ACIDS
+            rng (np.random.Generator): random number generator
+
+        Returns:
+            np.ndarray: uint8 codon indices of the same shape
+        """
+        groups = np.asarray(amino_acid_indices, dtype=np.intp)
+        x = rng.random(groups.shape) * self.group_sizes[groups]
+        columns = x.astype(np.intp)
+        accept = x - columns < self.probability[groups, columns]
+        columns = np.where(accept, columns, self.alias[groups, columns])
+        return self.group_codons[groups, columns]
+
+
+@functools.lru_cache(maxsize=None)
+def _compiled_table(species: str) -> CodonTable:
+    return CodonTable(species)
+
+
+def get_codon_table(species: str) -> CodonTable:
+    """
+    Returns the CodonTable of species, compiled on first use and shared
+    afterwards.
+    """
+    return _compiled_table(species.upper())
@@ -0,0 +1,280 @@
+"""
+Module contains CodonDesigner, an exact, deterministic alternative to
+optimization.DNAOptimizer.
+
+Instead of resampling codons until the constraints hold, the designer runs a
+Viterbi style dynamic program over the codon positions of a template. Its
+state is the state of a sites.SiteScanner finding every forbidden motif, so
+a codon that would complete a motif is never chosen, and, if there is a GC
+content constraint, the number of G and C nucleotides so far. Among the
+sequences encoding the template's amino acids and avoiding every motif it
+returns the one with the highest codon usage, i.e. the highest sum of log
+codon frequencies and therefore the highest CAI, or reports that there is
+none. Its cost is linear in the template length and does not depend on luck.
+A GC count is only kept while the threshold could still be exceeded, and
+only if no state with the same scanner state has fewer GC nucleotides and a
+higher score, so GC content adds few states in practice.
+"""
+
+import collections
+import itertools as it
+import math
+from typing import Callable, Dict, List, Tuple, Union
+
+from mablibs import encoding, sites
+from mablibs.codon_tables import get_codon_table
+from mablibs.metrics import PipelineMetrics
+from mablibs.optimization import (
+    Constraint,
+    GCContentConstraint,
+    NucleotideRepeatConstraint,
+    OptimizationError,
+    OptimizationResult,
+    RestrictionSiteConstraint,
+    _constraint_name,
+)
+from mablibs.templates import Template
+
+# motifs equivalent to NucleotideRepeatConstraint: runs of 4 identical
+# nucleotides and dinucleotides repeated 4 times
+REPEAT_MOTIFS = {
+    **{base * 4: base * 4 for base in sites.NUCLEOTIDES},
+    **{
+        f"{first}{second}" * 4: f"{first}{second}" * 4
+        for first, second in it.permutations(sites.NUCLEOTIDES, 2)
+    },
+}
+
+# (scanner state, GC count); the GC count is SLACK once no continuation can
+# exceed the GC content threshold
+State = Tuple[int, int]
+SLACK = -1
+
+
+def _pareto(layer: Dict[State, float]) -> Dict[State, float]:
+    """
+    Drops the states that have as many GC nucleotides as another state with
+    the same scanner state, but no higher score, as they cannot lead to a
+    better sequence. SLACK sorts first, as it has the most room.
+    """
+    kept, best = {}, {}
+    for state in sorted(layer):
+        scanner_state, _ = state
+        if layer[state] > best.get(scanner_state, -math.inf):
+            kept[state] = best[scanner_state] = layer[state]
+    return kept
+
+
+class CodonDesigner:
+    """
+    Chooses the synonymous codons of a template with the highest codon
+    usage that satisfy RestrictionSiteConstraints,
+    NucleotideRepeatConstraints and GCContentConstraints, by dynamic
+    programming. Other constraints cannot be part of the dynamic program's
+    state and are only checked on the result.
+
+    Has the optimize and optimize_template methods of DNAOptimizer, so it can
+    be used as the optimizer of a Mutagenesis or a CachedOptimizer. Designs
+    are deterministic, so unlike DNAOptimizer it takes no seed.
+    """
+
+    seed = None
+
+    def __init__(
+        self,
+        constraints: List[Callable],
+        species: str,
+        metrics: Union[None, PipelineMetrics] = None,
+    ) -> None:
+        """
+        Args:
+            constraints (List[Callable]): constraint functions or Constraints
+            species (str): species whose codon usage is maximised
+            metrics (Union[None, PipelineMetrics]): if given, records the
+            time spent designing, the codons changed per template and the
+            constraints violated before and after designing
+        """
+        self.constraints = constraints
+        self.species = species
+        self.metrics = metrics
+        self.codon_table = get_codon_table(species)
+
+        motifs, gc_thresholds, self.checked_constraints = {}, [], []
+        for constraint in constraints:
+            if isinstance(constraint, RestrictionSiteConstraint):
+                motifs.update(constraint.scanner.patterns)
+            elif isinstance(constraint, NucleotideRepeatConstraint):
+                motifs.update(REPEAT_MOTIFS)
+            elif isinstance(constraint, GCContentConstraint):
+                gc_thresholds.append(constraint.threshold)
+            else:
+                self.checked_constraints.append(constraint)
+        self.scanner = sites.SiteScanner(motifs)
+        self.gc_threshold = min(gc_thresholds, default=None)
+
+        self._log_usage = {
+            codon: math.log(frequency)
+            for codon, frequency in zip(
+                encoding.CODONS, self.codon_table.frequencies.tolist()
+            )
+        }
+        self._gc = {
+            codon: (
+                0
+                if self.gc_threshold is None
+                else codon.count("G") + codon.count("C")
+            )
+            for codon in encoding.CODONS
+        }
+        # scanner state after a codon, or None if the codon completes a motif
+        self._transitions: Dict[Tuple[int, str], Union[None, int]] = {}
+
+    def _step(self, state: int, codon: str) -> Union[None, int]:
+        key = state, codon
+        if key not in self._transitions:
+            for base in codon:
+                state = self.scanner.step(state, base)
+                if self.scanner.outputs[state]:
+                    state = None
+                    break
+            self._transitions[key] = state
+        return self._transitions[key]
+
+    def _options(self, codon: str) -> Tuple[str, ...]:
+        try:
+            return self.codon_table.synonyms(codon)
+        except NotImplementedError:
+            # stop codons are kept
+            return (codon,)
+
+    def _max_gc(self, length: int) -> Union[float, int]:
+        if self.gc_threshold is None or not length:
+            return math.inf
+        # same expression as is_below_gc_content_threshold
+        return max(
+            gc for gc in range(length + 1) if gc / length <= self.gc_threshold
+        )
+
+    def design(self, seq: str) -> Union[None, str]:
+        """
+        Returns the nucleotide sequence with the highest codon usage that
+        encodes the same amino acids as seq and has none of the motifs and
+        at most the GC content of the constraints, or None if there is none.
+        """
+        max_gc = self._max_gc(len(seq))
+        options = [self._options(seq[i : i + 3]) for i in range(0, len(seq), 3)]
+        # fewest and most GC nucleotides from each codon position to the end
+        least_gc, most_gc = [0], [0]
+        for codons in reversed(options):
+            gc = [self._gc[codon] for codon in codons]
+            least_gc.insert(0, least_gc[0] + min(gc))
+            most_gc.insert(0, most_gc[0] + max(gc))
+
+        start_gc = SLACK if most_gc[0] <= max_gc else 0
+        layer = {(self.scanner.start, start_gc): 0.0}
+        pointers: List[Dict[State, Tuple[State, str]]] = []
+        for i, codons in enumerate(options, 1):
+            next_layer, back = {}, {}
+            for (scanner_state, gc), score in layer.items():
+                for codon in codons:
+                    next_scanner_state = self._step(scanner_state, codon)
+                    if next_scanner_state is None:
+                        continue
+                    if gc == SLACK:
+                        next_gc = SLACK
+                    else:
+                        next_gc = gc + self._gc[codon]
+                        if next_gc + least_gc[i] > max_gc:
+                            continue
+                        if next_gc + most_gc[i] <= max_gc:
+                            next_gc = SLACK
+                    next_state = next_scanner_state, next_gc
+                    next_score = score + self._log_usage[codon]
+                    if next_score > next_layer.get(next_state, -math.inf):
+                        next_layer[next_state] = next_score
+                        back[next_state] = (scanner_state, gc), codon
+            if not next_layer:
+                return None
+            if self.gc_threshold is not None:
+                next_layer = _pareto(next_layer)
+            layer = next_layer
+            pointers.append(back)
+
+        state = max(layer, key=layer.get)
+        codons = collections.deque()
+        for back in reversed(pointers):
+            state, codon = back[state]
+            codons.appendleft(codon)
+        return "".join(codons)
+
+    def _violations(self, constraints: List[Callable], seq: str) -> Tuple:
+        violations = []
+        for constraint in constraints:
+            if isinstance(constraint, Constraint):
+                tracker = constraint.track(seq)
+                if not tracker.satisfied:
+                    violations.append((constraint, tuple(tracker.violations())))
+            elif not constraint(seq):
+                violations.append((constraint, ((0, len(seq)),)))
+        return tuple(violations)
+
+    def optimize(
+        self, template: Template, seed: Union[None, int] = None
+    ) -> OptimizationResult:
+        """
+        Designs the template's codons, see design. If no sequence satisfies
+        the constraints that are part of the dynamic program, the template is
+        returned unchanged with its violations. Otherwise the designed
+        template is returned with the violations of the constraints that are
+        only checked. iterations is the number of codons changed.
+
+        Args:
+            template (Template): template to design
+            seed: ignored, for compatibility with DNAOptimizer.optimize
+
+        Returns:
+            OptimizationResult: the designed template and its violations
+        """
+        if self.metrics is None:
+            return self._optimize(template)
+
+        with self.metrics.timer("optimize"):
+            result = self._optimize(template)
+        self.metrics.record_iterations(result.iterations)
+        self.metrics.count(
+            "optimized" if result.success else "optimization_failed"
+        )
+        for constraint, _ in result.violations:
+            self.metrics.constraint_failures[_constraint_name(constraint)] += 1
+        return result
+
+    def _optimize(self, template: Template) -> OptimizationResult:
+        seq = template.nucleotides
+        if self.metrics is not None:
+            self.metrics.constraint_violations.update(
+                _constraint_name(constraint)
+                for constraint, _ in self._violations(self.constraints, seq)
+            )
+
+        designed = self.design(seq)
+        if designed is None:
+            violations = self._violations(self.constraints, seq)
+            return OptimizationResult(template, False, 0, violations)
+
+        violations = self._violations(self.checked_constraints, designed)
+        changed = sum(
+            designed[i : i + 3] != seq[i : i + 3] for i in range(0, len(seq), 3)
+        )
+        if designed != seq:
+            template = Template(designed)
+        return OptimizationResult(template, not violations, changed, violations)
+
+    def optimize_template(self, template: Template) -> Template:
+        """
+        Like optimize, but returns the designed template and raises
+        OptimizationError if the constraints could not be satisfied.
+        """
+        result = self.optimize(template)
+        if not result.success:
+            raise OptimizationError(result)
+        return result.template
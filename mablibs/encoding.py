@@ -0,0 +1,86 @@
+"""
+Module contains the integer encodings of nucleotides, codons and amino acids
+used by the array based parts of the package.
+
+Nucleotides are encoded as 0-3 in the order of NUCLEOTIDES, codons as
+16 * first + 4 * second + third so that their indices follow CODONS, and
+amino acids as indices into AMINO_ACIDS.
+"""
+
+import itertools as it
+
+import numpy as np
+
+from mablibs import codons
+
+NUCLEOTIDES = "ACGT"
+AMINO_ACIDS = "".join(codons.AA2CODON)
+CODONS = tuple("".join(codon) for codon in it.product(NUCLEOTIDES, repeat=3))
+CODON_INDEX = {codon: i for i, codon in enumerate(CODONS)}
+
+# marks codons without an amino acid in codons.CODON2AA (stop codons) and
+# characters that are not part of an alphabet
+UNKNOWN = 255
+
+CODON_TO_AMINO_ACID = np.array(
+    [
+        (
+            AMINO_ACIDS.index(codons.CODON2AA[codon])
+            if codon in codons.CODON2AA
+            else UNKNOWN
+        )
+        for codon in CODONS
+    ],
+    dtype=np.uint8,
+)
+
+
+def _lookup_table(alphabet):
+    table = np.full(256, UNKNOWN, dtype=np.uint8)
+    table[np.frombuffer(alphabet.encode("ascii"), dtype=np.uint8)] = np.arange(
+        len(alphabet)
+    )
+    return table
+
+
+_NUCLEOTIDE_LOOKUP = _lookup_table(NUCLEOTIDES)
+_AMINO_ACID_LOOKUP = _lookup_table(AMINO_ACIDS)
+_NUCLEOTIDE_BYTES = np.frombuffer(NUCLEOTIDES.encode("ascii"), dtype=np.uint8)
+_AMINO_ACID_BYTES = np.frombuffer(AMINO_ACIDS.encode("ascii"), dtype=np.uint8)
+_CODON_BYTES = np.frombuffer(
+    "".join(CODONS).encode("ascii"), dtype=np.uint8
+).reshape(len(CODONS), 3)
+
+
+def _encode(seq: str, lookup: np.ndarray, kind: str) -> np.ndarray:
+    indices = lookup[np.frombuffer(seq.encode("ascii"), dtype=np.uint8)]
+    if (indices == UNKNOWN).any():
+        raise ValueError(f"sequence contains characters that are not {kind}")
+    return indices
+
+
+def encode_nucleotides(seq: str) -> np.ndarray:
+    return _encode(seq, _NUCLEOTIDE_LOOKUP, "nucleotides")
+
+
+def decode_nucleotides(indices: np.ndarray) -> str:
+    return _NUCLEOTIDE_BYTES[indices].tobytes().decode("ascii")
+
+
+def encode_codons(seq: str) -> np.ndarray:
+    if len(seq) % 3:
+        raise ValueError("sequence length must be a multiple of 3")
+    nucleotides = encode_nucleotides(seq).reshape(-1, 3)
+    return (nucleotides @ np.array([16, 4, 1], dtype=np.uint8)).astype(np.uint8)
+
+
+def decode_codons(indices: np.ndarray) -> str:
+    return _CODON_BYTES[indices].tobytes().decode("ascii")
+
+
+def encode_amino_acids(seq: str) -> np.ndarray:
+    return _encode(seq, _AMINO_ACID_LOOKUP, "amino acids")
+
+
+def decode_amino_acids(indices: np.ndarray) -> str:
+    return _AMINO_ACID_BYTES[indices].tobytes().decode("ascii")
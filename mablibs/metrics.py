@@ -0,0 +1,149 @@
+"""
+Module contains opt-in instrumentation for library generation. A
+PipelineMetrics instance passed to Mutagenesis and/or DNAOptimizer collects
+counters and cumulative wall time per stage. Without one, the pipeline only
+pays for an `is None` check per stage.
+"""
+
+import collections
+import contextlib
+import json
+import pathlib
+import time
+from typing import Callable, Dict, Iterable, Iterator, Union
+
+# shared no-op context manager returned by timer() when metrics are off
+_NULL_TIMER = contextlib.nullcontext()
+
+
+def timer(metrics: Union[None, "PipelineMetrics"], stage: str):
+    """
+    Returns a context manager timing stage if metrics is not None, else a
+    no-op one.
+    """
+    return _NULL_TIMER if metrics is None else metrics.timer(stage)
+
+
+def _iteration_bucket(iterations: int) -> int:
+    """
+    Returns the histogram bucket of an iteration count: 0, 1, 2, 4, 8, ...
+    """
+    return 0 if iterations <= 0 else 1 << (iterations.bit_length() - 1)
+
+
+class PipelineMetrics:
+    """
+    Counters and timers of a library generation run.
+
+    Attributes:
+        counters: event counts, e.g. enumerated, generated, ptm_rejected,
+            optimized and optimization_failed
+        timings: cumulative wall time in seconds per stage, e.g.
+            enumerate, ptm_filter, mutate and optimize
+        ptm_rejections: rejected variants per PTM motif kind
+        constraint_violations: variants violating each constraint before
+            optimization
+        constraint_failures: variants still violating each constraint after
+            optimization
+        optimizer_iterations: histogram of optimizer iterations per variant,
+            keyed by the lower bound of power of two buckets
+    """
+
+    def __init__(
+        self,
+        callback: Union[None, Callable[["PipelineMetrics"], None]] = None,
+        callback_interval: float = 1.0,
+    ) -> None:
+        """
+        Args:
+            callback (Union[None, Callable]): called with this object at most
+                every callback_interval seconds while counters are updated,
+                and once more when a run ends
+            callback_interval (float): minimum seconds between callbacks
+        """
+        self.callback = callback
+        self.callback_interval = callback_interval
+        self.counters = collections.Counter()
+        self.timings = collections.defaultdict(float)
+        self.ptm_rejections = collections.Counter()
+        self.constraint_violations = collections.Counter()
+        self.constraint_failures = collections.Counter()
+        self.optimizer_iterations = collections.Counter()
+        self._last_callback = time.monotonic()
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] += n
+        if (
+            self.callback is not None
+            and time.monotonic() - self._last_callback >= self.callback_interval
+        ):
+            self.notify()
+
+    def add_time(self, stage: str, seconds: float) -> None:
+        self.timings[stage] += seconds
+
+    @contextlib.contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[stage] += time.perf_counter() - start
+
+    def timed(
+        self, iterable: Iterable, stage: str, counter: str
+    ) -> Iterator:
+        """
+        Yields the items of iterable, adding the time spent producing them to
+        stage and counting them in counter.
+        """
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.timings[stage] += time.perf_counter() - start
+                return
+            self.timings[stage] += time.perf_counter() - start
+            self.count(counter)
+            yield item
+
+    def record_iterations(self, iterations: int) -> None:
+        self.optimizer_iterations[_iteration_bucket(iterations)] += 1
+
+    def notify(self) -> None:
+        """
+        Calls the callback, if any.
+        """
+        self._last_callback = time.monotonic()
+        if self.callback is not None:
+            self.callback(self)
+
+    def as_dict(self) -> Dict:
+        return {
+            "counters": dict(self.counters),
+            "timings": dict(self.timings),
+            "ptm_rejections": dict(self.ptm_rejections),
+            "constraint_violations": dict(self.constraint_violations),
+            "constraint_failures": dict(self.constraint_failures),
+            "optimizer_iterations": {
+                str(bucket): count
+                for bucket, count in sorted(self.optimizer_iterations.items())
+            },
+        }
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.as_dict(), **kwargs)
+
+    def dump(self, path: Union[str, pathlib.Path]) -> None:
+        """
+        Writes the metrics to path as JSON.
+        """
+        pathlib.Path(path).write_text(self.to_json(indent=2))
+
+    def __getstate__(self) -> Dict:
+        # callbacks are often closures, which cannot be sent to workers
+        state = self.__dict__.copy()
+        state["callback"] = None
+        return state
@@ -1,7 +1,58 @@
-from mablibs import codons
-from mablibs.ptms import find_ptm_motifs
+import collections
+import concurrent.futures
+import enum
+import itertools as it
+import os
+import random
+
+from mablibs import analysis, batches, codons
+from mablibs.metrics import timer
+from mablibs.optimization import variant_seed
+from mablibs.ptms import PTMChecker
 from mablibs.templates import Template
 
+# Mutagenesis instance installed in each pool worker by _init_worker, so that
+# the template, optimizer and compiled constraints are unpickled once per
+# process rather than once per batch.
+_worker_mutagenesis = None
+
+
+def _init_worker(mutagenesis):
+    global _worker_mutagenesis
+    _worker_mutagenesis = mutagenesis
+    # forked workers inherit the parent's global random state, reseed so
+    # that they do not all draw the same numbers
+    random.seed()
+
+
+def _process_batch(batch, mutagenesis=None):
+    if mutagenesis is None:
+        mutagenesis = _worker_mutagenesis
+    return mutagenesis._process_batch(batch)
+
+
+# a library member: its index in the randomization strategy's library, the
+# mutations applied to the template and the resulting (optimized) template
+LibraryRecord = collections.namedtuple(
+    "LibraryRecord", "rank mutations template"
+)
+
+
+class VariantFlag(enum.IntFlag):
+    """
+    Outcome of filtering and optimizing a library member.
+    """
+
+    PTM_REJECTED = 1
+    OPTIMIZATION_FAILED = 2
+    OPTIMIZED = 4
+
+
+def _batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(it.islice(iterator, size)):
+        yield batch
+
 
 def get_preferred_codons(species):
     key = codons.CODON_FREQUENCIES[species.upper()].get
@@ -17,13 +68,48 @@ class Mutagenesis:
         ptms_to_exclude=None,
         optimizer=None,
         sample_size=None,
+        unique=False,
+        metrics=None,
+        seed=None,
     ):
+        """
+        Args:
+            randomization_strategy (RandomizationStrategy): the library
+            template (Template): the parent template
+            species (str): species whose preferred codons are used
+            ptms_to_exclude: kinds of PTM motif to exclude, see mablibs.ptms
+            optimizer (DNAOptimizer): optimizer applied to every variant
+            sample_size (int): if given, only a random sample of this many
+                members is generated
+            unique (bool): if True, only one member per distinct amino acid
+                sequence is generated, see
+                RandomizationStrategy.iter_unique
+            metrics (PipelineMetrics): if given, counts and times the stages
+                of library generation. Pass the same object to the
+                optimizer to also collect optimizer metrics.
+            seed (int): if given, the sample is drawn with this seed and
+                every variant is optimized with its own seed derived from it
+                and the variant's amino acid sequence, see
+                optimization.variant_seed. The library is then the same
+                whatever the number of workers. Otherwise the optimizer's
+                own seed is used for every variant.
+        """
+        if unique and sample_size is not None:
+            raise ValueError("unique and sample_size cannot be combined")
         self.randomization_strategy = randomization_strategy
         self.template = template
         self.aa2codon = get_preferred_codons(species)
         self.ptms_to_exclude = ptms_to_exclude
+        self.ptm_checker = (
+            None
+            if ptms_to_exclude is None
+            else PTMChecker(template.amino_acids, ptms_to_exclude)
+        )
         self.optimizer = optimizer
         self.sample_size = sample_size
+        self.unique = unique
+        self.metrics = metrics
+        self.seed = seed
 
     def mutate(self, template, mutations) -> str:
         codons = template.codons()
@@ -33,30 +119,255 @@ class Mutagenesis:
         nucleotides = "".join(codons)
         return Template(nucleotides)
 
-    def generate_library(self):
-        if self.sample_size is None:
-            randomization = self.randomization_strategy.get_mutations()
-        else:
-            randomization = self.randomization_strategy.sample(self.sample_size)
+    def mutate_batch(self, residue_batch):
+        """
+        Vectorised mutate for a batch of residue indices from
+        RandomizationStrategy.get_residue_batches. Returns a
+        (batch, n_codons) codon index matrix.
+        """
+        return batches.mutate_batch(
+            self.template,
+            self.randomization_strategy,
+            residue_batch,
+            self.aa2codon,
+        )
+
+    def generate_batches(self, batch_size=4096):
+        """
+        Generates the unfiltered library as (batch, n_codons) codon index
+        matrices, see mablibs.batches.
+        """
+        for residue_batch in self.randomization_strategy.get_residue_batches(
+            batch_size
+        ):
+            yield self.mutate_batch(residue_batch)
+
+    def evaluate(self, mutations, check_ptms=True):
+        """
+        Builds, filters and optimizes a single variant.
+
+        Args:
+            mutations: (position, residue) pairs
+            check_ptms (bool): if False, the variant is assumed to be free of
+                excluded PTM motifs, e.g. because enumeration pruned them.
 
-        for mutations in randomization:
+        Returns:
+            Tuple[VariantFlag, Template]: the outcome, and the template or
+            None if the variant is excluded
+        """
+        if check_ptms and self.ptm_checker is not None:
+            # skip mutation if it generates a sequence with a ptm site
+            with timer(self.metrics, "ptm_filter"):
+                rejected = self.ptm_checker.has_excluded_motif(mutations)
+            if rejected:
+                if self.metrics is not None:
+                    self.metrics.count("ptm_rejected")
+                    self.metrics.ptm_rejections.update(
+                        self.ptm_checker.excluded_kinds(mutations)
+                    )
+                return VariantFlag.PTM_REJECTED, None
+
+        with timer(self.metrics, "mutate"):
             new_template = self.mutate(self.template, mutations)
 
-            if self.ptms_to_exclude is not None:
-                if ptm_motifs := find_ptm_motifs(
-                    "".join(new_template.amino_acids)
-                ):
-                    # skip mutation if it generates a sequence with a ptm site
-                    if any(
-                        ptm.kind in self.ptms_to_exclude for ptm in ptm_motifs
-                    ):
-                        continue
-
-            if self.optimizer is None:
-                yield new_template
-
-            else:
-                yield self.optimizer.optimize_template(new_template)
+        if self.optimizer is None:
+            return VariantFlag(0), new_template
+
+        # skip mutation if its codons cannot be made to satisfy the constraints
+        if self.seed is None:
+            result = self.optimizer.optimize(new_template)
+        else:
+            result = self.optimizer.optimize(
+                new_template,
+                seed=variant_seed(self.seed, new_template.amino_acids),
+            )
+        if not result.success:
+            return VariantFlag.OPTIMIZATION_FAILED, None
+        return VariantFlag.OPTIMIZED, result.template
+
+    def statistics(self):
+        """
+        Computes exact statistics of the PTM filtered library without
+        generating it, see mablibs.analysis.library_statistics. Variants that
+        fail optimization are not accounted for.
+
+        Returns:
+            analysis.LibraryStatistics: library statistics
+        """
+        return analysis.library_statistics(
+            self.randomization_strategy,
+            self.template.amino_acids,
+            self.ptm_checker,
+        )
+
+    def _process(self, rank, mutations):
+        # generate_records only enumerates members without excluded motifs,
+        # sampled members are not pruned and are checked here
+        _, new_template = self.evaluate(
+            mutations, check_ptms=self.sample_size is not None
+        )
+        if new_template is None:
+            return None
+        return LibraryRecord(rank, mutations, new_template)
+
+    def classify_library(self):
+        """
+        Evaluates every member of the library, including excluded ones.
+
+        Returns:
+            Iterator[Tuple[int, VariantFlag]]: rank and outcome of each member
+        """
+        for rank, mutations in self._get_randomization():
+            flags, _ = self.evaluate(mutations)
+            yield rank, flags
+
+    def _process_batch(self, batch):
+        return [
+            record
+            for record in it.starmap(self._process, batch)
+            if record is not None
+        ]
+
+    def _get_randomization(self, prune=False):
+        """
+        Returns an iterator of (rank, mutations) pairs. If prune is True,
+        members with an excluded PTM motif are left out during enumeration.
+        """
+        if self.unique:
+            return self.randomization_strategy.iter_unique(
+                self.template.amino_acids, self.ptm_checker if prune else None
+            )
+        if self.sample_size is None:
+            if prune and self.ptm_checker is not None:
+                return self.randomization_strategy.iter_passing(
+                    self.ptm_checker
+                )
+            return enumerate(self.randomization_strategy.get_mutations())
+
+        return (
+            (rank, self.randomization_strategy[rank])
+            for rank in self.randomization_strategy.sample_ranks(
+                self.sample_size, self.seed
+            )
+        )
+
+    def generate_library(self, **kwargs):
+        """
+        Generates the templates of the library. Takes the same arguments as
+        generate_records.
+        """
+        for record in self.generate_records(**kwargs):
+            yield record.template
+
+    def generate_records(
+        self,
+        workers=None,
+        executor=None,
+        ordered=True,
+        batch_size=256,
+        max_pending=None,
+    ):
+        """
+        Generates the library as LibraryRecords, optionally in parallel.
+
+        Args:
+            workers (int): number of processes to spread the mutations over.
+                Each process receives a copy of this object once, when it
+                starts, and is then only sent batches of mutations.
+            executor (concurrent.futures.Executor): an existing executor to
+                use instead of creating a process pool. As the executor's
+                workers cannot be initialised, this object is sent along with
+                every batch.
+            ordered (bool): if True records are yielded in library order,
+                otherwise in the order batches complete.
+            batch_size (int): number of mutations sent to a worker at a time.
+            max_pending (int): maximum number of batches in flight, which
+                bounds memory use. Defaults to four per worker.
+
+        If the Mutagenesis has metrics, enumeration and generated records are
+        counted in this process. The filtering and mutation stages are only
+        recorded when they run in this process, i.e. serially or on an
+        executor of threads, as process pool workers update their own copy.
+        """
+        records = self._generate_records(
+            workers, executor, ordered, batch_size, max_pending
+        )
+        if self.metrics is None:
+            yield from records
+            return
+
+        try:
+            for record in records:
+                self.metrics.count("generated")
+                yield record
+        finally:
+            self.metrics.notify()
+
+    def _generate_records(
+        self, workers, executor, ordered, batch_size, max_pending
+    ):
+        randomization = self._get_randomization(prune=True)
+        if self.metrics is not None:
+            randomization = self.metrics.timed(
+                randomization, "enumerate", "enumerated"
+            )
+
+        if workers is None and executor is None:
+            for rank, mutations in randomization:
+                if (record := self._process(rank, mutations)) is not None:
+                    yield record
+            return
+
+        mutation_batches = _batched(randomization, batch_size)
+        max_pending = max_pending or 4 * (workers or os.cpu_count() or 1)
+
+        if executor is not None:
+            yield from self._map_batches(
+                executor,
+                mutation_batches,
+                ordered,
+                max_pending,
+                mutagenesis=self,
+            )
+            return
+
+        executor = concurrent.futures.ProcessPoolExecutor(
+            workers, initializer=_init_worker, initargs=(self,)
+        )
+        try:
+            yield from self._map_batches(
+                executor, mutation_batches, ordered, max_pending
+            )
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+    @staticmethod
+    def _map_batches(
+        executor, mutation_batches, ordered, max_pending, mutagenesis=None
+    ):
+        if ordered:
+            pending = collections.deque()
+            for batch in mutation_batches:
+                pending.append(
+                    executor.submit(_process_batch, batch, mutagenesis)
+                )
+                if len(pending) >= max_pending:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+            return
+
+        pending = set()
+        for batch in mutation_batches:
+            pending.add(executor.submit(_process_batch, batch, mutagenesis))
+            if len(pending) >= max_pending:
+                done, pending = concurrent.futures.wait(
+                    pending, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    yield from future.result()
+        for future in concurrent.futures.as_completed(pending):
+            yield from future.result()
 
 
 if __name__ == "__main__":
@@ -2,9 +2,15 @@ import functools
 import itertools as it
 import random
 import re
-from typing import Callable, Dict, List
+import time
+from collections import namedtuple
+from typing import Callable, Dict, Iterator, List, Tuple, Union
 
-from mablibs import codons, enzymes
+import numpy as np
+
+from mablibs import codons, enzymes, sites
+from mablibs.codon_tables import get_codon_table
+from mablibs.metrics import PipelineMetrics
 from mablibs.templates import Template
 
 
@@ -18,6 +24,15 @@ def compile_restriction_site_regex(*restriction_sites):
     )
 
 
+def compile_restriction_site_scanner(*restriction_sites):
+    """
+    Like compile_restriction_site_regex, but returns a sites.SiteScanner,
+    which finds all the sites in one linear pass and can also be passed as
+    the patterns of pattern_not_found.
+    """
+    return sites.SiteScanner.from_enzymes(*restriction_sites)
+
+
 def compile_nucleotide_repeat_regex():
     single_repeat = r"([ATCG])\1{3,}"
     double_repeat = "|".join(
@@ -51,6 +66,334 @@ def is_below_gc_content_threshold(seq, threshold=0.65):
     return (seq.count("G") + seq.count("C")) / len(seq) <= threshold
 
 
+def motif_length(pattern: str) -> int:
+    """
+    Returns the number of residues matched by a fixed length motif pattern
+    such as those in enzymes.ENZYMES or ptms.amino_acid_ptm_specification,
+    e.g. "GT[AC][GT]AC" -> 6.
+    """
+    return len(re.sub(r"\[[^\]]*\]", ".", pattern))
+
+
+class Constraint:
+    """
+    Base class for constraints that DNAOptimizer can re-check incrementally.
+
+    Calling a constraint checks a whole sequence, like the constraint
+    functions above. track returns a tracker for one sequence, with a
+    satisfied attribute and an update(seq, start, end, replaced) method that
+    is called after seq[start:end] has replaced the nucleotides replaced.
+    Constraints with a radius only need to look at the nucleotides within
+    radius of a change, constraints without one are re-checked in full.
+    Trackers of unsatisfied constraints report the offending (start, end)
+    spans from violations(), which DNAOptimizer uses to pick the codons to
+    change.
+    """
+
+    radius: Union[None, int] = None
+
+    def __call__(self, seq: str) -> bool:
+        return self.track(seq).satisfied
+
+    def track(self, seq: str):
+        raise NotImplementedError
+
+
+class _FunctionTracker:
+    """
+    Tracker for plain constraint functions, re-checks the whole sequence.
+    """
+
+    def __init__(self, constraint: Callable, seq: str) -> None:
+        self.constraint = constraint
+        self.length = len(seq)
+        self.satisfied = constraint(seq)
+
+    def update(self, seq: str, start: int, end: int, replaced: str) -> None:
+        self.satisfied = self.constraint(seq)
+
+    def violations(self) -> List[Tuple[int, int]]:
+        return [] if self.satisfied else [(0, self.length)]
+
+
+class PatternConstraint(Constraint):
+    """
+    Constraint satisfied when a pattern matching at most length nucleotides
+    is not found. Keeps the span of every match so that after a change only
+    the starts within length of it are searched again.
+    """
+
+    def __init__(self, pattern: str, length: int) -> None:
+        self.pattern = pattern
+        self.length = length
+        self.radius = length - 1
+        self._regex = re.compile(pattern)
+        # zero width lookahead so that overlapping matches are all found, with
+        # an empty group marking where the match ends
+        self._spans_regex = re.compile(f"(?=(?:{pattern})(?P<_end>))")
+
+    def __call__(self, seq: str) -> bool:
+        return self._regex.search(seq) is None
+
+    def match_spans(
+        self, seq: str, low: int = 0, high: Union[None, int] = None
+    ) -> Iterator[Tuple[int, int]]:
+        """
+        Yields the (start, end) of every match lying entirely within
+        seq[low:high].
+        """
+        high = len(seq) if high is None else high
+        return (
+            (mo.start(), mo.start("_end"))
+            for mo in self._spans_regex.finditer(seq, low, high)
+        )
+
+    def track(self, seq: str) -> "_PatternTracker":
+        return _PatternTracker(self, seq)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.pattern!r}, {self.length})"
+
+
+class _PatternTracker:
+    """
+    Tracker for constraints with a length, radius and match_spans, such as
+    PatternConstraint and RestrictionSiteConstraint.
+    """
+
+    def __init__(self, constraint: Constraint, seq: str) -> None:
+        self.constraint = constraint
+        # match end by match start
+        self.spans = (
+            {} if constraint(seq) else dict(constraint.match_spans(seq))
+        )
+
+    @property
+    def satisfied(self) -> bool:
+        return not self.spans
+
+    def update(self, seq: str, start: int, end: int, replaced: str) -> None:
+        low = max(start - self.constraint.radius, 0)
+        high = min(end + self.constraint.radius, len(seq))
+        if self.spans:
+            for match_start in range(low, end):
+                self.spans.pop(match_start, None)
+        self.spans.update(self.constraint.match_spans(seq, low, high))
+
+    def violations(self) -> List[Tuple[int, int]]:
+        return list(self.spans.items())
+
+
+class RestrictionSiteConstraint(Constraint):
+    """
+    Constraint satisfied when none of the given restriction sites are found.
+    Sites are found with a sites.SiteScanner rather than a regex, and tracked
+    like the matches of a PatternConstraint.
+    """
+
+    def __init__(self, *restriction_sites: str) -> None:
+        self.restriction_sites = restriction_sites
+        self.scanner = compile_restriction_site_scanner(*restriction_sites)
+        self.length = max(self.scanner.max_length, 1)
+        self.radius = self.length - 1
+
+    def __call__(self, seq: str) -> bool:
+        return self.scanner.search(seq) is None
+
+    def match_spans(
+        self, seq: str, low: int = 0, high: Union[None, int] = None
+    ) -> Iterator[Tuple[int, int]]:
+        return (
+            (site.start, site.end)
+            for site in self.scanner.finditer(seq, low, high)
+        )
+
+    def track(self, seq: str) -> _PatternTracker:
+        return _PatternTracker(self, seq)
+
+    def __repr__(self):
+        return f"{type(self).__name__}{self.restriction_sites!r}"
+
+
+class NucleotideRepeatConstraint(PatternConstraint):
+    """
+    Constraint satisfied when the sequence has no run of 4 or more identical
+    nucleotides and no dinucleotide repeated 4 or more times, i.e. when
+    compile_nucleotide_repeat_regex does not match. Only the shortest repeats
+    are searched for, as any longer repeat contains one.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(r"([ATCG])\1{3}|([ATCG]{2})\2{3}", 8)
+
+    def __repr__(self):
+        return f"{type(self).__name__}()"
+
+
+class GCContentConstraint(Constraint):
+    """
+    Constraint equivalent to is_below_gc_content_threshold that keeps a
+    running GC count, updated in constant time per change.
+    """
+
+    radius = 0
+
+    def __init__(self, threshold: float = 0.65) -> None:
+        self.threshold = threshold
+
+    def __call__(self, seq: str) -> bool:
+        return is_below_gc_content_threshold(seq, self.threshold)
+
+    def track(self, seq: str) -> "_GCContentTracker":
+        return _GCContentTracker(self, seq)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.threshold})"
+
+
+class _GCContentTracker:
+    def __init__(self, constraint: GCContentConstraint, seq: str) -> None:
+        self.length = len(seq)
+        self.threshold = constraint.threshold
+        self.gc = seq.count("G") + seq.count("C")
+
+    @property
+    def satisfied(self) -> bool:
+        # same expression as is_below_gc_content_threshold, so that both
+        # round identically at the threshold
+        return self.gc / self.length <= self.threshold
+
+    def update(self, seq: str, start: int, end: int, replaced: str) -> None:
+        inserted = seq[start:end]
+        self.gc += (
+            inserted.count("G")
+            + inserted.count("C")
+            - replaced.count("G")
+            - replaced.count("C")
+        )
+
+    def violations(self) -> List[Tuple[int, int]]:
+        return [] if self.satisfied else [(0, self.length)]
+
+
+def _gc_indicator(seq: str) -> np.ndarray:
+    nucleotides = np.frombuffer(seq.encode("ascii"), dtype=np.uint8)
+    return (nucleotides == ord("G")) | (nucleotides == ord("C"))
+
+
+def _window_gc_counts(seq: str, window: int) -> np.ndarray:
+    """
+    Returns the GC count of every window of seq, from a prefix sum.
+    """
+    prefix = np.zeros(len(seq) + 1, dtype=np.int64)
+    np.cumsum(_gc_indicator(seq), out=prefix[1:])
+    return prefix[window:] - prefix[:-window]
+
+
+def local_gc_violations(
+    seq: str, window: int = 50, low: float = 0.25, high: float = 0.65
+) -> List[Tuple[int, int]]:
+    """
+    Returns the (start, end) of every window of seq whose GC content is
+    below low or above high. Sequences shorter than window are checked as a
+    single window.
+    """
+    window = min(window, len(seq))
+    if not window:
+        return []
+    fractions = _window_gc_counts(seq, window) / window
+    return [
+        (int(start), int(start) + window)
+        for start in np.flatnonzero((fractions < low) | (fractions > high))
+    ]
+
+
+class WindowedGCConstraint(Constraint):
+    """
+    Constraint satisfied when the GC content of every window of window
+    nucleotides lies within [low, high], as required by synthesis vendors.
+    Trackers keep the GC count of every window, updated with a NumPy slice
+    addition when codons change.
+    """
+
+    def __init__(
+        self, window: int = 50, low: float = 0.25, high: float = 0.65
+    ) -> None:
+        self.window = window
+        self.low = low
+        self.high = high
+        self.radius = window - 1
+
+    def __call__(self, seq: str) -> bool:
+        return not local_gc_violations(seq, self.window, self.low, self.high)
+
+    def track(self, seq: str) -> "_WindowedGCTracker":
+        return _WindowedGCTracker(self, seq)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.window}, {self.low}, {self.high})"
+
+
+class _WindowedGCTracker:
+    def __init__(self, constraint: WindowedGCConstraint, seq: str) -> None:
+        self.constraint = constraint
+        self.window = min(constraint.window, len(seq))
+        self.counts = (
+            _window_gc_counts(seq, self.window)
+            if self.window
+            else np.zeros(0, dtype=np.int64)
+        )
+        self.bad = self._is_bad(self.counts)
+        self.n_bad = int(np.count_nonzero(self.bad))
+
+    def _is_bad(self, counts: np.ndarray) -> np.ndarray:
+        fractions = counts / self.window
+        return (fractions < self.constraint.low) | (
+            fractions > self.constraint.high
+        )
+
+    @property
+    def satisfied(self) -> bool:
+        return not self.n_bad
+
+    def update(self, seq: str, start: int, end: int, replaced: str) -> None:
+        deltas = _gc_indicator(seq[start:end]).astype(np.int64) - _gc_indicator(
+            replaced
+        )
+        if not deltas.any():
+            return
+        # windows containing position i start in [i - window + 1, i]
+        last_start = len(self.counts) - 1
+        low = max(start - self.window + 1, 0)
+        high = min(end - 1, last_start)
+        for i, delta in enumerate(deltas, start):
+            if delta:
+                self.counts[
+                    max(i - self.window + 1, 0) : min(i, last_start) + 1
+                ] += delta
+        bad = self._is_bad(self.counts[low : high + 1])
+        self.n_bad += int(np.count_nonzero(bad)) - int(
+            np.count_nonzero(self.bad[low : high + 1])
+        )
+        self.bad[low : high + 1] = bad
+
+    def violations(self) -> List[Tuple[int, int]]:
+        """
+        Returns the spans covered by violating windows, with overlapping
+        windows merged, see local_gc_violations for the windows themselves.
+        """
+        starts = np.flatnonzero(self.bad)
+        if not len(starts):
+            return []
+        breaks = np.flatnonzero(np.diff(starts) > 1)
+        firsts = np.concatenate(([starts[0]], starts[breaks + 1]))
+        lasts = np.concatenate((starts[breaks], [starts[-1]]))
+        return [
+            (int(first), int(last) + self.window)
+            for first, last in zip(firsts, lasts)
+        ]
+
+
 @functools.lru_cache(maxsize=None)
 def get_synonymous_codons(
     codon: str, synonymous_codons: List[List[str]]
@@ -62,46 +405,205 @@ def get_synonymous_codons(
         raise NotImplementedError("codon not in synonymous codons")
 
 
+OptimizationResult = namedtuple(
+    "OptimizationResult", "template success iterations violations"
+)
+OptimizationResult.__doc__ = """
+Outcome of DNAOptimizer.optimize. violations holds a (constraint, spans)
+pair for every constraint that was still unsatisfied.
+"""
+
+
+class OptimizationError(RuntimeError):
+    def __init__(self, result: OptimizationResult) -> None:
+        super().__init__(
+            f"constraints not satisfied after {result.iterations} iterations"
+        )
+        self.result = result
+
+
+def variant_seed(seed: int, key: str) -> int:
+    """
+    Derives the seed of one variant of a seeded run from the run's seed and
+    a string identifying the variant, e.g. its amino acid sequence, with
+    numpy.random.SeedSequence. The derived seed only depends on seed and
+    key, so a variant is optimized identically whichever process or thread
+    it runs in and in whatever order.
+    """
+    sequence = np.random.SeedSequence(seed, spawn_key=tuple(key.encode()))
+    return int(sequence.generate_state(1, np.uint64)[0])
+
+
+def _constraint_name(constraint: Callable) -> str:
+    return getattr(constraint, "__name__", None) or repr(constraint)
+
+
 class DNAOptimizer:
     def __init__(
         self,
         constraints: List[Callable],
         species: str,
         seed=None,
+        max_iterations: Union[None, int] = 10_000,
+        time_budget: Union[None, float] = None,
+        metrics: Union[None, PipelineMetrics] = None,
     ) -> None:
+        """
+        Args:
+            constraints (List[Callable]): constraint functions or Constraints
+            species (str): species whose codon usage is sampled from
+            seed: random seed
+            max_iterations (Union[None, int]): maximum number of codon changes
+            per template, None for no limit
+            time_budget (Union[None, float]): maximum number of seconds spent
+            per template, None for no limit
+            metrics (Union[None, PipelineMetrics]): if given, records the
+            time spent optimizing, the iterations per template and the
+            constraints violated before and after optimization
+        """
         self.constraints = constraints
         self.codon_ref = tuple(codons.AA2CODON.values())
+        self.species = species
         self.codon_frequencies = codons.CODON_FREQUENCIES[species.upper()]
+        self.codon_table = get_codon_table(species)
         self.seed = seed
+        self.max_iterations = max_iterations
+        self.time_budget = time_budget
+        self.metrics = metrics
+        # generator of change_codon, optimize creates its own per call
+        self._rng = random.Random(seed)
+
+    def _resample_codon(self, codon: str, rng: random.Random) -> str:
+        return self.codon_table.sample(codon, rng)
 
     def change_codon(self, i: int, template: Template) -> Template:
         codons = template.codons()
-        codon_to_replace = codons[i]
-        synonymous_codons = get_synonymous_codons(
-            codon_to_replace, self.codon_ref
-        )
-        weights = [self.codon_frequencies[codon] for codon in synonymous_codons]
-        if self.seed:
-            random.seed(self.seed)
-        replacement_codon = random.choices(
-            synonymous_codons, weights=weights, k=1
-        )
-        codons[i] = replacement_codon[0]  # codon comes wrapped in list
+        codons[i] = self._resample_codon(codons[i], self._rng)
         nucleotides = "".join(codons)
         return Template(nucleotides)
 
+    def _track(self, seq: str) -> List:
+        return [
+            (
+                constraint.track(seq)
+                if isinstance(constraint, Constraint)
+                else _FunctionTracker(constraint, seq)
+            )
+            for constraint in self.constraints
+        ]
+
+    def _repairable_codons(self, seq: str, trackers: List) -> List[int]:
+        """
+        Returns the codons that overlap a violation and have synonyms.
+        """
+        indices = set()
+        for tracker in trackers:
+            if not tracker.satisfied:
+                for start, end in tracker.violations():
+                    indices.update(range(start // 3, (end + 2) // 3))
+        return [
+            i
+            for i in sorted(indices)
+            if len(self.codon_table.synonyms(seq[3 * i : 3 * i + 3])) > 1
+        ]
+
+    def optimize(
+        self, template: Template, seed: Union[None, int] = None
+    ) -> OptimizationResult:
+        """
+        Resamples synonymous codons that overlap a constraint violation until
+        every constraint is satisfied, max_iterations codons have been
+        changed, time_budget has run out or no codon in a violation can be
+        changed. After each change, constraints deriving from Constraint only
+        re-check the nucleotides around the changed codon.
+
+        Codons are drawn from a random number generator created for each
+        call, seeded with seed or, if it is None, the optimizer's seed. Calls
+        share no random state, so results are reproducible, the optimizer
+        can be shared between threads and the global random module is left
+        untouched.
+
+        Args:
+            template (Template): template to optimize
+            seed (Union[None, int]): seed for this call, e.g. from
+            variant_seed
+
+        Returns:
+            OptimizationResult: the optimized template and its violations
+        """
+        if self.metrics is None:
+            return self._optimize(template, seed)
+
+        with self.metrics.timer("optimize"):
+            result = self._optimize(template, seed)
+        self.metrics.record_iterations(result.iterations)
+        self.metrics.count(
+            "optimized" if result.success else "optimization_failed"
+        )
+        for constraint, _ in result.violations:
+            self.metrics.constraint_failures[_constraint_name(constraint)] += 1
+        return result
+
+    def _optimize(
+        self, template: Template, seed: Union[None, int]
+    ) -> OptimizationResult:
+        seq = template.nucleotides
+        trackers = self._track(seq)
+        if all(tracker.satisfied for tracker in trackers):
+            return OptimizationResult(template, True, 0, ())
+        if self.metrics is not None:
+            self.metrics.constraint_violations.update(
+                _constraint_name(constraint)
+                for constraint, tracker in zip(self.constraints, trackers)
+                if not tracker.satisfied
+            )
+
+        deadline = (
+            None
+            if self.time_budget is None
+            else time.monotonic() + self.time_budget
+        )
+
+        rng = random.Random(self.seed if seed is None else seed)
+        iterations = 0
+        while not all(tracker.satisfied for tracker in trackers):
+            if (
+                self.max_iterations is not None
+                and iterations >= self.max_iterations
+            ) or (deadline is not None and time.monotonic() > deadline):
+                break
+            if not (candidates := self._repairable_codons(seq, trackers)):
+                break
+
+            iterations += 1
+            i = rng.choice(candidates)
+            start, end = 3 * i, 3 * i + 3
+            replaced = seq[start:end]
+            codon = self._resample_codon(replaced, rng)
+            if codon == replaced:
+                continue
+
+            seq = seq[:start] + codon + seq[end:]
+            for tracker in trackers:
+                tracker.update(seq, start, end, replaced)
+
+        violations = tuple(
+            (constraint, tuple(tracker.violations()))
+            for constraint, tracker in zip(self.constraints, trackers)
+            if not tracker.satisfied
+        )
+        if seq != template.nucleotides:
+            template = Template(seq)
+        return OptimizationResult(
+            template, not violations, iterations, violations
+        )
+
     def optimize_template(self, template: Template) -> str:
-        if all(
-            constraint(template.nucleotides) for constraint in self.constraints
-        ):
-            return template
-
-        n_codons = len(template.codons())
-        codon_indices = range(n_codons)
-        for i in it.cycle(codon_indices):
-            template = self.change_codon(i, template)
-            if all(
-                constraint(template.nucleotides)
-                for constraint in self.constraints
-            ):
-                return template
+        """
+        Like optimize, but returns the optimized template and raises
+        OptimizationError if the constraints could not be satisfied.
+        """
+        result = self.optimize(template)
+        if not result.success:
+            raise OptimizationError(result)
+        return result.template
@@ -2,6 +2,8 @@ import re
 from collections import namedtuple
 from typing import Union
 
+from mablibs.optimization import motif_length
+
 amino_acid_ptm_specification = (
     ("GLYCOSYLATION_MOTIF", r"N[^P][ST]"),
     ("DEAMIDATION_MOTIF", r"N[GSA]"),
@@ -29,3 +31,110 @@ def find_ptm_motifs(seq: str, verbose: bool = True) -> Union[PTMmotif, bool]:
             for mo in matches
         ]
     return True
+
+
+class PTMChecker:
+    """
+    Checks variants of a template for PTM motifs of the excluded kinds.
+
+    The template is scanned once, when the checker is created. A variant is
+    then checked by testing whether any template motif is left untouched by
+    its mutations and by scanning only the few residues around each mutated
+    position, as no motif is longer than max_length residues.
+    """
+
+    def __init__(self, amino_acids: str, ptms_to_exclude) -> None:
+        """
+        Args:
+            amino_acids (str): the template's amino acid sequence
+            ptms_to_exclude: kinds of PTM motif to look for, e.g.
+            {"DEAMIDATION_MOTIF"}
+        """
+        self.parent = amino_acids
+        self.specification = tuple(
+            (kind, pattern)
+            for kind, pattern in amino_acid_ptm_specification
+            if kind in ptms_to_exclude
+        )
+        self.max_length = max(
+            (motif_length(pattern) for _, pattern in self.specification),
+            default=1,
+        )
+        self._regex = re.compile(
+            "|".join(pattern for _, pattern in self.specification) or "(?!)"
+        )
+        # compiled pattern and length of each excluded kind, for checking
+        # windows that are exactly one motif long
+        self.motif_rules = tuple(
+            (re.compile(pattern), motif_length(pattern))
+            for _, pattern in self.specification
+        )
+
+        # every (possibly overlapping) template motif, and the motifs
+        # covering each position
+        self.parent_motifs = [
+            PTMmotif(
+                kind, mo.group(1), mo.start(), mo.start() + len(mo.group(1))
+            )
+            for kind, pattern in self.specification
+            for mo in re.finditer(f"(?=({pattern}))", amino_acids)
+        ]
+        self._covering = {}
+        for i, motif in enumerate(self.parent_motifs):
+            for position in range(motif.start, motif.end):
+                self._covering.setdefault(position, []).append(i)
+
+    def leaves_parent_motif(self, positions) -> bool:
+        """
+        Returns True if a template motif does not overlap any of positions, in
+        which case every variant mutating only those positions has an
+        excluded motif.
+        """
+        if not self.parent_motifs:
+            return False
+        touched = set()
+        for position in positions:
+            touched.update(self._covering.get(position, ()))
+        return len(touched) < len(self.parent_motifs)
+
+    def has_excluded_motif(self, mutations) -> bool:
+        """
+        Returns True if the template with mutations applied contains a motif
+        of an excluded kind.
+
+        Args:
+            mutations: (position, residue) pairs, as generated by
+            RandomizationStrategy
+        """
+        if self.leaves_parent_motif(position for position, _ in mutations):
+            return True
+
+        substitutions = dict(mutations)
+        parent, reach = self.parent, self.max_length - 1
+        for position in substitutions:
+            window = "".join(
+                substitutions.get(i, parent[i])
+                for i in range(
+                    max(position - reach, 0),
+                    min(position + reach + 1, len(parent)),
+                )
+            )
+            if self._regex.search(window):
+                return True
+        return False
+
+    def excluded_kinds(self, mutations):
+        """
+        Returns the set of excluded kinds of motif found in the template with
+        mutations applied. Scans the whole variant, so it is meant for
+        reporting rather than filtering.
+        """
+        variant = list(self.parent)
+        for position, residue in mutations:
+            variant[position] = residue
+        variant = "".join(variant)
+        return {
+            kind
+            for kind, pattern in self.specification
+            if re.search(pattern, variant)
+        }
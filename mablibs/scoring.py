@@ -0,0 +1,144 @@
+"""
+Module contains the codon adaptation index (CAI, Sharp and Li 1987) of
+sequences under the codon usage of a species.
+
+The relative adaptiveness of a codon is its usage divided by the usage of
+the most frequent codon of its amino acid, and the CAI of a sequence is the
+geometric mean of the relative adaptiveness of its codons. Methionine and
+tryptophan, which have a single codon, and stop codons are left out. Log
+weights are precomputed once per species, so that a whole
+(batch, n_codons) codon index matrix is scored by one NumPy reduction.
+"""
+
+import collections
+import functools
+import math
+from typing import List, Tuple, Union
+
+import numpy as np
+
+from mablibs import encoding
+from mablibs.codon_tables import get_codon_table
+from mablibs.optimization import Constraint
+from mablibs.templates import Template
+
+EXCLUDED_AMINO_ACIDS = "MW"
+
+# log_weights: log relative adaptiveness of each codon index, 0 for codons
+#     that are not scored
+# scored: whether each codon index counts towards the CAI
+CAIWeights = collections.namedtuple("CAIWeights", "log_weights scored")
+
+
+@functools.lru_cache(maxsize=None)
+def _cai_weights(species: str) -> CAIWeights:
+    table = get_codon_table(species)
+    scored = table.amino_acids != encoding.UNKNOWN
+    for amino_acid in EXCLUDED_AMINO_ACIDS:
+        scored &= table.amino_acids != encoding.AMINO_ACIDS.index(amino_acid)
+
+    groups = np.where(scored, table.amino_acids, 0)
+    weights = table.frequencies / table.frequencies[table.preferred[groups]]
+    log_weights = np.where(scored, np.log(weights), 0.0)
+    return CAIWeights(log_weights, scored)
+
+
+def cai_weights(species: str) -> CAIWeights:
+    """
+    Returns the CAIWeights of species, computed on first use.
+    """
+    return _cai_weights(species.upper())
+
+
+def cai_batch(codon_matrix: np.ndarray, species: str) -> np.ndarray:
+    """
+    Computes the CAI of every row of a (batch, n_codons) codon index matrix.
+    Rows without scored codons have a CAI of 1.
+
+    Args:
+        codon_matrix (np.ndarray): codon indices, see mablibs.batches
+        species (str): species whose codon usage is used
+
+    Returns:
+        np.ndarray: (batch,) CAI of each row
+    """
+    log_weights, scored = cai_weights(species)
+    codon_matrix = np.asarray(codon_matrix)
+    n_scored = np.count_nonzero(scored[codon_matrix], axis=1)
+    total = log_weights[codon_matrix].sum(axis=1)
+    return np.exp(
+        np.divide(total, n_scored, out=np.zeros(len(total)), where=n_scored > 0)
+    )
+
+
+def cai(template: Union[str, Template], species: str) -> float:
+    """
+    Computes the CAI of a template or nucleotide sequence.
+    """
+    if isinstance(template, Template):
+        template = template.nucleotides
+    codon_indices = encoding.encode_codons(template)
+    return float(cai_batch(codon_indices[np.newaxis], species)[0])
+
+
+class CAIConstraint(Constraint):
+    """
+    Constraint requiring a CAI of at least threshold. Its tracker keeps a
+    running sum of log weights, updated in constant time per change, and
+    reports the codons that are not the most frequent of their amino acid
+    as violations, so that DNAOptimizer resamples those.
+    """
+
+    radius = 0
+
+    def __init__(self, species: str, threshold: float = 0.8) -> None:
+        self.species = species
+        self.threshold = threshold
+        log_weights, scored = cai_weights(species)
+        self.codon_weights = {
+            codon: (log_weight, bool(is_scored))
+            for codon, log_weight, is_scored in zip(
+                encoding.CODONS, log_weights.tolist(), scored
+            )
+        }
+
+    def track(self, seq: str) -> "_CAITracker":
+        return _CAITracker(self, seq)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.species!r}, {self.threshold})"
+
+
+class _CAITracker:
+    def __init__(self, constraint: CAIConstraint, seq: str) -> None:
+        self._codon_weights = constraint.codon_weights
+        self.log_threshold = math.log(constraint.threshold)
+        self.codons = [
+            self._codon_weights[seq[i : i + 3]] for i in range(0, len(seq), 3)
+        ]
+        self.total = sum(log_weight for log_weight, _ in self.codons)
+        self.n_scored = sum(is_scored for _, is_scored in self.codons)
+
+    @property
+    def satisfied(self) -> bool:
+        return (
+            self.n_scored == 0
+            or self.total / self.n_scored >= self.log_threshold
+        )
+
+    def update(self, seq: str, start: int, end: int, replaced: str) -> None:
+        for i in range(start // 3, (end + 2) // 3):
+            log_weight, is_scored = self._codon_weights[seq[3 * i : 3 * i + 3]]
+            previous_log_weight, was_scored = self.codons[i]
+            self.total += log_weight - previous_log_weight
+            self.n_scored += is_scored - was_scored
+            self.codons[i] = log_weight, is_scored
+
+    def violations(self) -> List[Tuple[int, int]]:
+        if self.satisfied:
+            return []
+        return [
+            (3 * i, 3 * i + 3)
+            for i, (log_weight, _) in enumerate(self.codons)
+            if log_weight < 0
+        ]
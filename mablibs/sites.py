@@ -0,0 +1,228 @@
+"""
+Module contains a deterministic automaton that finds restriction sites from
+enzymes.ENZYMES in a single pass over a sequence.
+"""
+
+from collections import namedtuple
+from typing import Dict, FrozenSet, Iterator, List, Tuple, Union
+
+from mablibs import codons, enzymes
+
+NUCLEOTIDES = "ACGT"
+
+SiteMatch = namedtuple("SiteMatch", "enzyme start end strand")
+
+Motif = Tuple[FrozenSet[str], ...]
+
+
+def _parse_class(pattern: str) -> FrozenSet[str]:
+    """
+    Parses a single position of a motif, e.g. "A", ".", "[AG]", "[^T]" or a
+    degenerate base from enzymes.restriction_enzyme_motif_vocab.
+    """
+    if pattern == ".":
+        return frozenset(NUCLEOTIDES)
+    if pattern in enzymes.restriction_enzyme_motif_vocab:
+        return _parse_class(enzymes.restriction_enzyme_motif_vocab[pattern])
+    if pattern.startswith("[^"):
+        return frozenset(NUCLEOTIDES) - _parse_class(f"[{pattern[2:-1]}]")
+    if pattern.startswith("["):
+        return frozenset().union(*map(_parse_class, pattern[1:-1]))
+    if pattern in NUCLEOTIDES:
+        return frozenset(pattern)
+    raise ValueError(f"unsupported motif character {pattern!r}")
+
+
+def parse_motif(pattern: str) -> Motif:
+    """
+    Converts a fixed length motif pattern into the set of nucleotides allowed
+    at each position, e.g. "G[AG]N" -> ({G}, {A, G}, {A, C, G, T}).
+    """
+    motif, i = [], 0
+    while i < len(pattern):
+        end = pattern.index("]", i) + 1 if pattern[i] == "[" else i + 1
+        motif.append(_parse_class(pattern[i:end]))
+        i = end
+    return tuple(motif)
+
+
+def reverse_complement_motif(motif: Motif) -> Motif:
+    return tuple(
+        frozenset(codons.COMPLEMENTARY_BASES[base] for base in bases)
+        for bases in reversed(motif)
+    )
+
+
+def is_self_complementary(pattern: str) -> bool:
+    """
+    Returns True if a motif reads the same on both strands, i.e. if it is
+    equal to its reverse complement, e.g. "GAATTC" or "GT[AC][GT]AC".
+    """
+    motif = parse_motif(pattern)
+    return motif == reverse_complement_motif(motif)
+
+
+# whether each enzyme's site is self-complementary, in which case scanning
+# the forward strand finds all of its sites
+SELF_COMPLEMENTARY = {
+    name: is_self_complementary(pattern)
+    for name, pattern in enzymes.ENZYMES.items()
+}
+
+
+class SiteScanner:
+    """
+    Finds all occurrences of a set of motifs in one left to right pass.
+
+    The scanner is a deterministic automaton built by subset construction
+    from the motifs, one state per set of partially matched motifs. States
+    are created lazily, the first time a transition is taken, and kept, so a
+    scanner gets faster as it is reused. Any character other than A, C, G or
+    T resets the automaton.
+
+    When both strands are scanned, the reverse complement of every motif that
+    is not self-complementary is added to the automaton, so sites on the
+    reverse strand are found in the same pass. Their matches have strand "-"
+    and give coordinates on the forward strand.
+    """
+
+    start = 0
+
+    def __init__(
+        self, motifs: Dict[str, str], both_strands: bool = True
+    ) -> None:
+        """
+        Args:
+            motifs (Dict[str, str]): mapping of names to motif patterns, e.g.
+            {"NheI": "GCTAGC"}
+            both_strands (bool): whether to also find sites on the reverse
+            strand
+        """
+        self.patterns = dict(motifs)
+        self.both_strands = both_strands
+        self.names, self.motifs, self.strands = [], [], []
+        for name, pattern in motifs.items():
+            motif = parse_motif(pattern)
+            self.names.append(name)
+            self.motifs.append(motif)
+            self.strands.append("+")
+            reverse_complement = reverse_complement_motif(motif)
+            if both_strands and reverse_complement != motif:
+                self.names.append(name)
+                self.motifs.append(reverse_complement)
+                self.strands.append("-")
+        self.lengths = [len(motif) for motif in self.motifs]
+        self.max_length = max(self.lengths, default=0)
+        # per state: partially matched (motif, position) pairs, the motifs
+        # that end on entering the state, and transitions by nucleotide
+        self._items: List[FrozenSet[Tuple[int, int]]] = []
+        self.outputs: List[Tuple[int, ...]] = []
+        self._transitions: List[Dict[str, int]] = []
+        self._state_ids: Dict[Tuple, int] = {}
+        self._add_state(frozenset(), ())
+
+    @classmethod
+    def from_enzymes(
+        cls, *restriction_sites: str, both_strands: bool = True
+    ) -> "SiteScanner":
+        return cls(
+            {
+                name: pattern
+                for name, pattern in enzymes.ENZYMES.items()
+                if name in restriction_sites
+            },
+            both_strands=both_strands,
+        )
+
+    def _add_state(self, items, outputs) -> int:
+        key = (items, outputs)
+        if (state := self._state_ids.get(key)) is None:
+            state = self._state_ids[key] = len(self._items)
+            self._items.append(items)
+            self.outputs.append(outputs)
+            self._transitions.append({})
+        return state
+
+    def _add_transition(self, state: int, base: str) -> int:
+        if base not in NUCLEOTIDES:
+            self._transitions[state][base] = self.start
+            return self.start
+
+        items, outputs = set(), []
+        started = ((motif, 0) for motif in range(len(self.motifs)))
+        for motif, position in (*self._items[state], *started):
+            if base in self.motifs[motif][position]:
+                if position + 1 == self.lengths[motif]:
+                    outputs.append(motif)
+                else:
+                    items.add((motif, position + 1))
+
+        next_state = self._add_state(frozenset(items), tuple(sorted(outputs)))
+        self._transitions[state][base] = next_state
+        return next_state
+
+    def step(self, state: int, base: str) -> int:
+        """
+        Returns the state reached from state on reading base. Matches ending on
+        base are given by outputs[returned state].
+        """
+        try:
+            return self._transitions[state][base]
+        except KeyError:
+            return self._add_transition(state, base)
+
+    def finditer(
+        self, seq: str, start: int = 0, end: Union[None, int] = None
+    ) -> Iterator[SiteMatch]:
+        """
+        Yields every site lying entirely within seq[start:end], including
+        overlapping ones, in order of their end position.
+        """
+        transitions, outputs = self._transitions, self.outputs
+        state = self.start
+        for i in range(start, len(seq) if end is None else end):
+            try:
+                state = transitions[state][seq[i]]
+            except KeyError:
+                state = self._add_transition(state, seq[i])
+            for motif in outputs[state]:
+                yield SiteMatch(
+                    self.names[motif],
+                    i + 1 - self.lengths[motif],
+                    i + 1,
+                    self.strands[motif],
+                )
+
+    def search(self, seq: str) -> Union[None, SiteMatch]:
+        """
+        Returns the site that ends first in seq, or None. Like re.search, so a
+        scanner can be passed as the patterns of optimization.pattern_not_found.
+        """
+        transitions, outputs = self._transitions, self.outputs
+        state = self.start
+        for i, base in enumerate(seq):
+            try:
+                state = transitions[state][base]
+            except KeyError:
+                state = self._add_transition(state, base)
+            if outputs[state]:
+                motif = outputs[state][0]
+                return SiteMatch(
+                    self.names[motif],
+                    i + 1 - self.lengths[motif],
+                    i + 1,
+                    self.strands[motif],
+                )
+        return None
+
+    def __getstate__(self):
+        return {"motifs": self.patterns, "both_strands": self.both_strands}
+
+    def __setstate__(self, state):
+        self.__init__(state["motifs"], state["both_strands"])
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}({list(self.patterns)!r}, "
+            f"both_strands={self.both_strands})"
+        )
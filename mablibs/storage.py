@@ -0,0 +1,198 @@
+"""
+Module contains a compact binary library format. A library file stores the
+RandomizationStrategy and parent Template that define a library, followed by
+one fixed size record per variant holding its rank (index in the strategy's
+library) and VariantFlags. Variants are recovered by unranking, so a library
+costs 9 bytes per variant on disk, and files are read through mmap without
+parsing.
+
+Layout:
+
+    MAGIC                      8 bytes
+    header length              little endian uint64
+    header                     JSON, padded with spaces to a multiple of 8
+    records                    RECORD_DTYPE, until the end of the file
+"""
+
+import collections
+import json
+import pathlib
+from typing import Iterable, Iterator, Tuple, Union
+
+import numpy as np
+
+from mablibs.mutagenesis import Mutagenesis, VariantFlag
+from mablibs.strategies import Mutation, RandomizationStrategy
+from mablibs.templates import Template
+
+MAGIC = b"MABLIB\x00\x01"
+RECORD_DTYPE = np.dtype([("rank", "<u8"), ("flags", "u1")])
+
+LibraryEntry = collections.namedtuple("LibraryEntry", "rank mutations flags")
+
+Path = Union[str, pathlib.Path]
+
+
+class LibraryWriter:
+    """
+    Appends variant records to a library file, e.g.
+
+        with LibraryWriter(path, randomization_strategy, template) as writer:
+            writer.write(ranks, flags)
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        randomization_strategy: RandomizationStrategy,
+        template: Template,
+    ) -> None:
+        if randomization_strategy.size() > np.iinfo(np.uint64).max:
+            raise ValueError("library ranks do not fit in 64 bits")
+
+        header = json.dumps(
+            {
+                "position_residue_mapping": [
+                    [position, list(residues)]
+                    for position, residues in (
+                        randomization_strategy.position_residue_mapping.items()
+                    )
+                ],
+                "n": randomization_strategy.n,
+                "template": template.nucleotides,
+            }
+        ).encode("utf-8")
+        header += b" " * (-len(header) % 8)
+
+        self._file = open(path, "wb")
+        self._file.write(MAGIC)
+        self._file.write(len(header).to_bytes(8, "little"))
+        self._file.write(header)
+
+    def write(
+        self,
+        ranks: Iterable[int],
+        flags: Union[int, Iterable[int]] = 0,
+    ) -> None:
+        """
+        Appends records.
+
+        Args:
+            ranks (Iterable[int]): ranks of the variants
+            flags (Union[int, Iterable[int]]): VariantFlags of each variant,
+            or of all of them
+        """
+        ranks = np.asarray(ranks, dtype=np.uint64)
+        records = np.empty(len(ranks), dtype=RECORD_DTYPE)
+        records["rank"] = ranks
+        records["flags"] = flags
+        self._file.write(records.tobytes())
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "LibraryWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+def write_library(
+    path: Path, mutagenesis: Mutagenesis, chunk_size: int = 65536
+) -> None:
+    """
+    Evaluates every member of a Mutagenesis library and writes its rank and
+    VariantFlags, including those of excluded members, to a library file.
+    """
+    with LibraryWriter(
+        path, mutagenesis.randomization_strategy, mutagenesis.template
+    ) as writer:
+        ranks, flags = [], []
+        for rank, flag in mutagenesis.classify_library():
+            ranks.append(rank)
+            flags.append(flag)
+            if len(ranks) == chunk_size:
+                writer.write(ranks, flags)
+                ranks, flags = [], []
+        writer.write(ranks, flags)
+
+
+class LibraryFile:
+    """
+    Read-only, memory mapped view of a library file. records, ranks and flags
+    are NumPy arrays backed by the file, so opening a library and selecting
+    variants does not read it into memory.
+    """
+
+    def __init__(self, path: Path) -> None:
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a library file")
+            header_length = int.from_bytes(f.read(8), "little")
+            header = json.loads(f.read(header_length))
+
+        self.path = pathlib.Path(path)
+        self.randomization_strategy = RandomizationStrategy(
+            {
+                position: residues
+                for position, residues in header["position_residue_mapping"]
+            },
+            header["n"],
+        )
+        self.template = Template(header["template"])
+
+        offset = len(MAGIC) + 8 + header_length
+        n_records = (self.path.stat().st_size - offset) // RECORD_DTYPE.itemsize
+        if n_records:
+            self.records = np.memmap(
+                path,
+                dtype=RECORD_DTYPE,
+                mode="r",
+                offset=offset,
+                shape=(n_records,),
+            )
+        else:
+            # mmap cannot map an empty region
+            self.records = np.empty(0, dtype=RECORD_DTYPE)
+
+    @property
+    def ranks(self) -> np.ndarray:
+        return self.records["rank"]
+
+    @property
+    def flags(self) -> np.ndarray:
+        return self.records["flags"]
+
+    def select(self, set_flags: int = 0, clear_flags: int = 0) -> np.ndarray:
+        """
+        Returns the ranks of the variants with all of set_flags and none of
+        clear_flags, e.g. select(clear_flags=VariantFlag.PTM_REJECTED).
+        """
+        flags = self.flags
+        mask = (flags & set_flags) == set_flags
+        if clear_flags:
+            mask &= (flags & clear_flags) == 0
+        return self.ranks[mask]
+
+    def mutations(self, rank: int) -> Tuple[Mutation]:
+        return self.randomization_strategy[int(rank)]
+
+    def iter_mutations(self, ranks: Iterable[int]) -> Iterator[Tuple[Mutation]]:
+        for rank in ranks:
+            yield self.mutations(rank)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __getitem__(
+        self, key: Union[int, slice]
+    ) -> Union[LibraryEntry, np.ndarray]:
+        """
+        Returns a LibraryEntry for an integer index, or a view of the records
+        for a slice.
+        """
+        if isinstance(key, slice):
+            return self.records[key]
+        rank, flags = self.records[key]
+        return LibraryEntry(int(rank), self.mutations(rank), VariantFlag(flags))
@@ -4,8 +4,18 @@ import operator
 import random
 from typing import Any, Dict, Iterator, List, Sequence, Tuple, Union
 
+import numpy as np
+
+from mablibs import analysis
+from mablibs.ptms import PTMChecker
+
 Mutation = Tuple[int, str]
 
+# residue index used in residue batches for positions that are not mutated
+UNMUTATED = 255
+# largest mixed-radix value decoded with int64 arithmetic in residue batches
+_MAX_ARRAY_RADIX = 2**62
+
 
 class RandomizationStrategy:
     """
@@ -21,6 +31,7 @@ class RandomizationStrategy:
         self,
         position_residue_mapping: Dict[int, str],
         n: Union[None, int] = None,
+        ptm_checker: Union[None, PTMChecker] = None,
     ) -> None:
         """
         Args:
@@ -35,9 +46,17 @@ class RandomizationStrategy:
             n (Union[None, int]): number of positions to mutate at one time. If None,
             n defaults to the number of positions specified in the position_residue_mapping
             and all positions will be mutated simultaneously.
+            ptm_checker (Union[None, PTMChecker]): if given, the PTM motifs it
+            excludes are pruned from the library during enumeration, so
+            get_mutations and ranges only generate passing mutations. Indices
+            (__getitem__, sample, len) still refer to the unfiltered library.
         """
         self.position_residue_mapping = position_residue_mapping
         self.n = n or len(position_residue_mapping)
+        self.ptm_checker = ptm_checker
+        self._groups = self.zip_keys_to_vals(position_residue_mapping)
+        self._sizes = [len(group) for group in self._groups]
+        self._subset_sums = self._elementary_symmetric_sums(self._sizes, self.n)
 
     def _get_position_residue_pairs(self) -> Iterator[Mutation]:
         """
@@ -76,10 +95,28 @@ class RandomizationStrategy:
             list(g) for _, g in it.groupby(mutations, key=self.position_getter)
         ]
 
-    def get_mutations(self) -> Iterator[Tuple[Mutation]]:
+    def get_mutations(
+        self,
+        shard: Union[None, int] = None,
+        num_shards: Union[None, int] = None,
+    ) -> Iterator[Tuple[Mutation]]:
         """
         Method returns an Iterator of all unique n length combinations of mutations.
+
+        Args:
+            shard (Union[None, int]): index of the slice of the library to return.
+            num_shards (Union[None, int]): number of equally sized, contiguous
+            slices the library is split into. Shard boundaries only depend on
+            the library size, so shards can be generated independently by
+            different processes or nodes and concatenated in shard order to
+            recover the full library.
         """
+        if shard is not None or num_shards is not None:
+            return self.ranges(*self.shard_bounds(shard, num_shards))
+
+        if self.ptm_checker is not None:
+            return (mutations for _, mutations in self.iter_passing())
+
         grouped_mutations = self._group_by_position(
             self._get_position_residue_pairs()
         )
@@ -87,29 +124,563 @@ class RandomizationStrategy:
             [it.product(*c) for c in it.combinations(grouped_mutations, self.n)]
         )
 
+    def shard_bounds(self, shard: int, num_shards: int) -> Tuple[int, int]:
+        """
+        Method returns the [start, stop) library indices of a shard.
+
+        Args:
+            shard (int): index of the shard, 0 <= shard < num_shards
+            num_shards (int): total number of shards
+
+        Returns:
+            Tuple[int, int]: start and stop library indices
+        """
+        if shard is None or num_shards is None:
+            raise ValueError(
+                '"shard" and "num_shards" must be provided together'
+            )
+        if not 0 <= shard < num_shards:
+            raise ValueError(f"shard must be in [0, {num_shards}), got {shard}")
+
+        size = self.size()
+        return size * shard // num_shards, size * (shard + 1) // num_shards
+
+    def ranges(
+        self, start: int = 0, stop: Union[None, int] = None
+    ) -> Iterator[Tuple[Mutation]]:
+        """
+        Method returns an Iterator over the mutations with library indices in
+        [start, stop), in get_mutations order. The first mutation is unranked
+        directly, so no part of the library before start is enumerated.
+
+        Args:
+            start (int): index of the first mutation
+            stop (Union[None, int]): index one past the last mutation, defaults
+            to the library size
+
+        Returns:
+            Iterator[Tuple[Mutation]]: mutations
+        """
+        size = self.size()
+        stop = size if stop is None else min(stop, size)
+        if not 0 <= start < stop:
+            return iter(())
+
+        combination, residue_indices = self._unrank(start)
+        mutations = it.islice(
+            self._iter_from(combination, residue_indices), stop - start
+        )
+        if self.ptm_checker is None:
+            return mutations
+        return it.filterfalse(self.ptm_checker.has_excluded_motif, mutations)
+
+    def iter_passing(
+        self, ptm_checker: Union[None, PTMChecker] = None
+    ) -> Iterator[Tuple[int, Tuple[Mutation]]]:
+        """
+        Method yields the library index and mutations of every member of the
+        library without a motif excluded by ptm_checker, in get_mutations
+        order.
+
+        Rather than generating every member and filtering it, the residues of
+        a combination are chosen one position at a time and a branch is cut
+        as soon as the residues chosen so far complete an excluded motif, so
+        rejected members are never built. Combinations that leave a template
+        motif untouched are skipped entirely.
+
+        Args:
+            ptm_checker (Union[None, PTMChecker]): defaults to the strategy's
+            own ptm_checker. If neither is set, the whole library is yielded.
+
+        Returns:
+            Iterator[Tuple[int, Tuple[Mutation]]]: (index, mutations) pairs
+        """
+        ptm_checker = ptm_checker or self.ptm_checker
+        if ptm_checker is None:
+            yield from enumerate(self.get_mutations())
+            return
+
+        offset = 0
+        for combination in it.combinations(range(len(self._groups)), self.n):
+            groups = [self._groups[group] for group in combination]
+            positions = [group[0][0] for group in groups]
+            if not ptm_checker.leaves_parent_motif(positions):
+                yield from self._iter_pruned(
+                    groups, positions, offset, ptm_checker
+                )
+            offset += self.mul_lens(groups)
+
+    @staticmethod
+    def _iter_pruned(
+        groups: List[List[Mutation]],
+        positions: List[int],
+        offset: int,
+        ptm_checker: PTMChecker,
+    ) -> Iterator[Tuple[int, Tuple[Mutation]]]:
+        """
+        Method yields the (index, mutations) pairs of one combination that
+        pass ptm_checker, by depth first search over its positions.
+
+        A motif window is checked at the last mutated position it contains,
+        which is the first point at which all of its residues are known.
+        Once no window remains to be checked, the rest of the subtree is
+        generated with itertools.product.
+        """
+        parent = ptm_checker.parent
+        residues = list(parent)
+        checks = []
+        for j, position in enumerate(positions):
+            next_position = (
+                positions[j + 1] if j + 1 < len(positions) else len(parent)
+            )
+            checks.append(
+                [
+                    (regex, start, start + length)
+                    for regex, length in ptm_checker.motif_rules
+                    for start in range(
+                        max(0, position - length + 1),
+                        min(position, next_position - length) + 1,
+                    )
+                ]
+            )
+        # levels from which on nothing is checked
+        free = len(positions)
+        while free and not checks[free - 1]:
+            free -= 1
+
+        def search(level, prefix, index):
+            if level == free:
+                remaining = groups[level:]
+                scale = RandomizationStrategy.mul_lens(remaining or [[None]])
+                for i, suffix in enumerate(it.product(*remaining)):
+                    yield offset + index * scale + i, prefix + suffix
+                return
+
+            position = positions[level]
+            for residue_index, mutation in enumerate(groups[level]):
+                residues[position] = mutation[1]
+                if not any(
+                    regex.fullmatch("".join(residues[start:end]))
+                    for regex, start, end in checks[level]
+                ):
+                    yield from search(
+                        level + 1,
+                        prefix + (mutation,),
+                        index * len(groups[level]) + residue_index,
+                    )
+            residues[position] = parent[position]
+
+        return search(0, (), 0)
+
+    def n_passing(self) -> int:
+        """
+        Method returns the number of library members without a motif excluded
+        by the strategy's ptm_checker, computed exactly without enumerating
+        the library (see mablibs.analysis).
+        """
+        if self.ptm_checker is None:
+            return self.size()
+        return analysis.count_passing(self, self.ptm_checker)
+
+    def statistics(
+        self, amino_acids: Union[None, str] = None
+    ) -> analysis.LibraryStatistics:
+        """
+        Method returns exact statistics of the library after PTM exclusion:
+        its size, the number of passing members, the number of passing
+        members with each residue at each randomized position and the
+        distribution of the number of residues changed from the parent. The
+        library is not enumerated, see mablibs.analysis.
+
+        Args:
+            amino_acids (Union[None, str]): the parent amino acid sequence,
+            defaults to that of the strategy's ptm_checker
+
+        Returns:
+            analysis.LibraryStatistics: library statistics
+        """
+        return analysis.library_statistics(
+            self, self._parent(amino_acids), self.ptm_checker
+        )
+
+    def _parent(self, amino_acids: Union[None, str]) -> str:
+        if amino_acids is None:
+            if self.ptm_checker is None:
+                raise ValueError(
+                    "amino_acids is required without a ptm_checker"
+                )
+            amino_acids = self.ptm_checker.parent
+        return amino_acids
+
+    def _wild_type_indices(
+        self, amino_acids: Union[None, str]
+    ) -> List[Union[None, int]]:
+        """
+        Method returns, for every position, the index of the parent residue
+        in its residue list, or None if the parent residue is not listed.
+        """
+        parent = self._parent(amino_acids)
+        return [
+            next(
+                (
+                    residue_index
+                    for residue_index, (position, residue) in enumerate(group)
+                    if residue == parent[position]
+                ),
+                None,
+            )
+            for group in self._groups
+        ]
+
+    def iter_unique(
+        self,
+        amino_acids: Union[None, str] = None,
+        ptm_checker: Union[None, PTMChecker] = None,
+    ) -> Iterator[Tuple[int, Tuple[Mutation]]]:
+        """
+        Method yields the library index and mutations of one member per
+        distinct amino acid sequence of the library, in get_mutations order.
+
+        When residue lists contain the parent residue, members that only
+        differ in which positions are "mutated" to the parent residue give
+        the same sequence. Of those, the canonical member is the one whose
+        unchanged positions are the first positions listing the parent
+        residue that are not changed. So a position of a combination may
+        keep the parent residue only if no earlier position outside the
+        combination could have kept it instead, which is decided per
+        combination without hashing any sequence.
+
+        Args:
+            amino_acids (Union[None, str]): the parent amino acid sequence,
+            defaults to that of the strategy's ptm_checker
+            ptm_checker (Union[None, PTMChecker]): if given, or if the
+            strategy has one, members with an excluded motif are left out
+
+        Returns:
+            Iterator[Tuple[int, Tuple[Mutation]]]: (index, mutations) pairs
+        """
+        ptm_checker = ptm_checker or self.ptm_checker
+        wild_type = self._wild_type_indices(amino_acids)
+        n_groups = len(self._groups)
+
+        offset = 0
+        for combination in it.combinations(range(n_groups), self.n):
+            groups = [self._groups[group] for group in combination]
+            # first position outside the combination that can keep the
+            # parent residue, later positions must change it
+            first_free = next(
+                (
+                    group
+                    for group in range(n_groups)
+                    if wild_type[group] is not None and group not in combination
+                ),
+                n_groups,
+            )
+            choices = [
+                [
+                    residue_index
+                    for residue_index in range(self._sizes[group])
+                    if group < first_free or residue_index != wild_type[group]
+                ]
+                for group in combination
+            ]
+            for residue_indices in it.product(*choices):
+                index = 0
+                for group, residue_index in zip(combination, residue_indices):
+                    index = index * self._sizes[group] + residue_index
+                mutations = tuple(
+                    group[residue_index]
+                    for group, residue_index in zip(groups, residue_indices)
+                )
+                if ptm_checker is None or not ptm_checker.has_excluded_motif(
+                    mutations
+                ):
+                    yield offset + index, mutations
+            offset += self.mul_lens(groups)
+
+    def get_unique_mutations(
+        self, amino_acids: Union[None, str] = None
+    ) -> Iterator[Tuple[Mutation]]:
+        """
+        Method returns an Iterator over one combination of mutations per
+        distinct amino acid sequence, see iter_unique.
+        """
+        return (mutations for _, mutations in self.iter_unique(amino_acids))
+
+    def n_unique(self, amino_acids: Union[None, str] = None) -> int:
+        """
+        Method returns the number of distinct amino acid sequences in the
+        library, i.e. the number of members yielded by iter_unique without a
+        ptm_checker. Computed in O(number of positions * n) by counting
+        canonical members position by position.
+
+        Args:
+            amino_acids (Union[None, str]): the parent amino acid sequence,
+            defaults to that of the strategy's ptm_checker
+
+        Returns:
+            int: number of distinct sequences
+        """
+        wild_type = self._wild_type_indices(amino_acids)
+        # counts[passed][k]: canonical partial members with k positions
+        # chosen, by whether a position that could keep the parent residue
+        # was left out
+        counts = [[1] + [0] * self.n, [0] * (self.n + 1)]
+        for size, wild_type_index in zip(self._sizes, wild_type):
+            listed = wild_type_index is not None
+            next_counts = [[0] * (self.n + 1), [0] * (self.n + 1)]
+            for passed in (0, 1):
+                for k, count in enumerate(counts[passed]):
+                    if not count:
+                        continue
+                    next_counts[passed or listed][k] += count
+                    if k < self.n:
+                        next_counts[passed][k + 1] += count * (
+                            size - (passed and listed)
+                        )
+            counts = next_counts
+        return counts[0][self.n] + counts[1][self.n]
+
+    def get_residue_batches(
+        self,
+        batch_size: int = 4096,
+        start: int = 0,
+        stop: Union[None, int] = None,
+    ) -> Iterator[np.ndarray]:
+        """
+        Method returns the mutations with library indices in [start, stop) as
+        uint8 arrays of shape (batch_size, number of positions), in library
+        order. Batches are not filtered by ptm_checker. Columns follow the order of
+        position_residue_mapping and hold the index of the substituted residue
+        in that position's residue list, or UNMUTATED. The last batch may be
+        shorter.
+
+        e.g. with {1: ['A', 'C'], 3: ['D', 'E']} and n=1
+
+            [[0, 255], [1, 255], [255, 0], [255, 1]]
+
+        Args:
+            batch_size (int): number of mutations per batch
+            start (int): index of the first mutation
+            stop (Union[None, int]): index one past the last mutation, defaults
+            to the library size
+
+        Returns:
+            Iterator[np.ndarray]: batches of residue indices
+        """
+        if max(self._sizes, default=0) > UNMUTATED:
+            raise ValueError(f"positions can have at most {UNMUTATED} residues")
+
+        size = self.size()
+        stop = size if stop is None else min(stop, size)
+        if not 0 <= start < stop:
+            return
+
+        combination, residue_indices = self._unrank(start)
+        offset = 0
+        for group, residue_index in zip(combination, residue_indices):
+            offset = offset * self._sizes[group] + residue_index
+
+        remaining, pieces, filled = stop - start, [], 0
+        for combination in it.chain(
+            [combination], self._combinations_after(combination)
+        ):
+            block = self.mul_lens(
+                [self._groups[group] for group in combination]
+            )
+            while offset < block and remaining:
+                length = min(block - offset, batch_size - filled, remaining)
+                pieces.append(self._decode_block(combination, offset, length))
+                offset += length
+                filled += length
+                remaining -= length
+                if filled == batch_size:
+                    yield np.concatenate(pieces)
+                    pieces, filled = [], 0
+            if not remaining:
+                break
+            offset = 0
+
+        if pieces:
+            yield np.concatenate(pieces)
+
+    def _decode_block(
+        self, combination: List[int], offset: int, length: int
+    ) -> np.ndarray:
+        """
+        Method decodes length consecutive mixed-radix residue products of a
+        combination, starting at offset, into an array of residue indices.
+
+        The trailing positions whose product fits in int64 are decoded with
+        NumPy. The leading positions can change at most once within the block
+        and are decoded in Python for both possible values.
+        """
+        residues = np.full(
+            (length, len(self._groups)), UNMUTATED, dtype=np.uint8
+        )
+
+        n_trailing, radix = 0, 1
+        for group in reversed(combination):
+            if radix * self._sizes[group] > _MAX_ARRAY_RADIX:
+                break
+            radix *= self._sizes[group]
+            n_trailing += 1
+        leading = combination[: len(combination) - n_trailing]
+        trailing = combination[len(combination) - n_trailing :]
+
+        high, low_start = divmod(offset, radix)
+        low = low_start + np.arange(length, dtype=np.int64)
+        carry = low >= radix
+        low[carry] -= radix
+
+        for group in reversed(trailing):
+            low, residues[:, group] = np.divmod(low, self._sizes[group])
+
+        for high_value in (high, high + 1):
+            rows = carry if high_value > high else ~carry
+            for group in reversed(leading):
+                high_value, residues[rows, group] = divmod(
+                    high_value, self._sizes[group]
+                )
+        return residues
+
+    def _iter_from(
+        self, combination: List[int], residue_indices: List[int]
+    ) -> Iterator[Tuple[Mutation]]:
+        """
+        Method yields the library starting at the given unranked mutation. The
+        remainder of the first combination is split into itertools.product
+        blocks, one per position, so that the iteration stays in C.
+        """
+        groups = [self._groups[group] for group in combination]
+        fixed = [
+            [group[residue_index]]
+            for group, residue_index in zip(groups, residue_indices)
+        ]
+        last = len(groups) - 1
+        for level in reversed(range(len(groups))):
+            first = residue_indices[level] + (level != last)
+            yield from it.product(
+                *fixed[:level], groups[level][first:], *groups[level + 1 :]
+            )
+
+        for later in self._combinations_after(combination):
+            yield from it.product(*(self._groups[group] for group in later))
+
+    def _combinations_after(
+        self, combination: List[int]
+    ) -> Iterator[List[int]]:
+        """
+        Method yields the combinations of group indices that follow
+        combination in itertools.combinations order.
+        """
+        n_groups, k = len(self._groups), len(combination)
+        combination = list(combination)
+        while True:
+            for i in reversed(range(k)):
+                if combination[i] < n_groups - k + i:
+                    break
+            else:
+                return
+            combination[i] += 1
+            for j in range(i + 1, k):
+                combination[j] = combination[j - 1] + 1
+            yield list(combination)
+
     def sample(
         self, k: int, seed: Union[int, None] = None
     ) -> Iterator[Tuple[Mutation]]:
         """
         Method takes a random sample of size k mutations from the total set of
-        mutations. Useful for investigating properties of very large libraries.
+        mutations, without replacement. Useful for investigating properties of
+        very large libraries. Each sampled mutation is unranked directly so the
+        library is never enumerated.
+
+        Args:
+            k (int): sample size
+            seed (Union[int, None]): seed for the sampler's own random number
+            generator. The global random module is left untouched.
+
+        Returns:
+            Iterator[Tuple[Mutation]]: a sample of mutations in library order
+        """
+        for rank in self.sample_ranks(k, seed):
+            yield self[rank]
+
+    def sample_ranks(self, k: int, seed: Union[int, None] = None) -> List[int]:
+        """
+        Method draws k distinct library indices using Floyd's algorithm, which
+        takes O(k) draws regardless of the library size.
 
         Args:
             k (int): sample size
+            seed (Union[int, None]): seed for the random number generator
 
         Returns:
-            Iterator[Tuple[Mutation]]: a sample of mutations
+            List[int]: sorted library indices
         """
-        mutations = self.get_mutations()
-        library_idxs = range(0, len(self))
+        library_size = self.size()
+        if not 0 <= k <= library_size:
+            raise ValueError(
+                f"sample size {k} must be between 0 and the library size "
+                f"{library_size}"
+            )
 
-        if seed:
-            random.seed(42)
+        rng = random.Random(seed)
+        selected = set()
+        for j in range(library_size - k, library_size):
+            t = rng.randrange(j + 1)
+            selected.add(j if t in selected else t)
+        return sorted(selected)
 
-        sample_indices = set(random.choices(library_idxs, k=k))
-        for i, mutation in enumerate(mutations):
-            if i in sample_indices:
-                yield mutation
+    def _unrank(self, index: int) -> Tuple[List[int], List[int]]:
+        """
+        Method converts a library index into the group indices of the
+        combination it belongs to and the residue index chosen at each of
+        those groups. Runs in O(number of positions).
+
+        Combinations are ordered as in itertools.combinations and, within a
+        combination, residues are ordered as in itertools.product, so that
+        index i corresponds to the i-th item of get_mutations.
+        """
+        combination, block_scale, remaining = [], 1, self.n
+        for group in range(len(self._sizes)):
+            if not remaining:
+                break
+            block = (
+                block_scale
+                * self._sizes[group]
+                * self._subset_sums[group + 1][remaining - 1]
+            )
+            if index < block:
+                combination.append(group)
+                block_scale *= self._sizes[group]
+                remaining -= 1
+            else:
+                index -= block
+
+        residue_indices = []
+        for group in reversed(combination):
+            index, residue_index = divmod(index, self._sizes[group])
+            residue_indices.append(residue_index)
+        return combination, residue_indices[::-1]
+
+    def __getitem__(self, index: int) -> Tuple[Mutation]:
+        """
+        Dunder method returns the mutation at position index of get_mutations
+        without enumerating the library.
+        """
+        library_size = self.size()
+        if index < 0:
+            index += library_size
+        if not 0 <= index < library_size:
+            raise IndexError("library index out of range")
+
+        combination, residue_indices = self._unrank(index)
+        return tuple(
+            self._groups[group][residue_index]
+            for group, residue_index in zip(combination, residue_indices)
+        )
 
     def __len__(self) -> int:
         """
@@ -118,12 +689,14 @@ class RandomizationStrategy:
         Returns (int):
             library size (number of unique sequences)
         """
-        return sum(
-            self.mul_lens(residues)
-            for residues in it.combinations(
-                self.position_residue_mapping.values(), self.n
-            )
-        )
+        return self.size()
+
+    def size(self) -> int:
+        """
+        Method returns the total library size. Unlike len(), this works for
+        libraries larger than sys.maxsize.
+        """
+        return self._subset_sums[0][self.n]
 
     @staticmethod
     def zip_keys_to_vals(
@@ -168,3 +741,21 @@ class RandomizationStrategy:
 
         """
         return functools.reduce(operator.mul, [len(i) for i in iterable])
+
+    @staticmethod
+    def _elementary_symmetric_sums(
+        sizes: Sequence[int], n: int
+    ) -> List[List[int]]:
+        """
+        Helper method to tabulate, for every suffix of sizes, the total
+        library size of choosing k of its positions, i.e. table[j][k] is the
+        sum over all k-combinations of sizes[j:] of the product of their
+        sizes. Used for computing the library size and for unranking.
+        """
+        table = [[0] * (n + 1) for _ in range(len(sizes) + 1)]
+        table[len(sizes)][0] = 1
+        for j in reversed(range(len(sizes))):
+            table[j][0] = 1
+            for k in range(1, n + 1):
+                table[j][k] = table[j + 1][k] + sizes[j] * table[j + 1][k - 1]
+        return table
@@ -1,6 +1,8 @@
-from typing import List
+from typing import List, Union
 
-from mablibs import codons
+import numpy as np
+
+from mablibs import codons, encoding
 
 
 class Template:
@@ -22,5 +24,140 @@ class Template:
             for i in range(0, len(self.nucleotides), 3)
         ]
 
+    def pack(self) -> "PackedTemplate":
+        return PackedTemplate(self.nucleotides)
+
     def __repr__(self):
         return f"Template({self.nucleotides})"
+
+
+class PackedTemplate:
+    """
+    Read-only Template that stores its nucleotides packed 2 bits each, i.e. 4
+    nucleotides per byte. Codon indices and the translation are computed on
+    first use and cached. Slicing returns a PackedTemplate that shares the
+    packed buffer of its parent.
+    """
+
+    __slots__ = (
+        "_buffer",
+        "_start",
+        "_length",
+        "_codon_indices",
+        "_amino_acids",
+    )
+
+    def __init__(self, nucleotides: str) -> None:
+        indices = encoding.encode_nucleotides(nucleotides)
+        padded = np.zeros(-(-len(indices) // 4) * 4, dtype=np.uint8)
+        padded[: len(indices)] = indices
+        quads = padded.reshape(-1, 4)
+        packed = (
+            quads[:, 0] | quads[:, 1] << 2 | quads[:, 2] << 4 | quads[:, 3] << 6
+        )
+        self._init(packed.tobytes(), 0, len(indices))
+
+    def _init(self, buffer: bytes, start: int, length: int) -> None:
+        self._buffer = buffer
+        self._start = start
+        self._length = length
+        self._codon_indices = None
+        self._amino_acids = None
+
+    @classmethod
+    def from_template(cls, template: Template) -> "PackedTemplate":
+        return cls(template.nucleotides)
+
+    def nucleotide_indices(self) -> np.ndarray:
+        """
+        Returns the nucleotides as an array of indices into
+        encoding.NUCLEOTIDES.
+        """
+        first_byte = self._start // 4
+        last_byte = -(-(self._start + self._length) // 4)
+        packed = np.frombuffer(
+            self._buffer,
+            dtype=np.uint8,
+            count=last_byte - first_byte,
+            offset=first_byte,
+        )
+        unpacked = (packed[:, np.newaxis] >> np.array([0, 2, 4, 6])) & 3
+        offset = self._start - 4 * first_byte
+        return unpacked.reshape(-1)[offset : offset + self._length].astype(
+            np.uint8
+        )
+
+    @property
+    def nucleotides(self) -> str:
+        return encoding.decode_nucleotides(self.nucleotide_indices())
+
+    def codon_indices(self) -> np.ndarray:
+        """
+        Returns the complete codons as an array of indices into
+        encoding.CODONS.
+        """
+        if self._codon_indices is None:
+            nucleotides = self.nucleotide_indices()
+            triplets = nucleotides[: len(nucleotides) // 3 * 3].reshape(-1, 3)
+            self._codon_indices = (
+                triplets @ np.array([16, 4, 1], dtype=np.uint8)
+            ).astype(np.uint8)
+        return self._codon_indices
+
+    def codons(self) -> List[str]:
+        codon_list = [encoding.CODONS[i] for i in self.codon_indices()]
+        if remainder := self._length % 3:
+            codon_list.append(self.nucleotides[-remainder:])
+        return codon_list
+
+    @property
+    def amino_acids(self) -> str:
+        if self._amino_acids is None:
+            if self._length % 3:
+                raise NotImplementedError(
+                    "Amino acid could not be found, error: incomplete codon"
+                )
+            amino_acid_indices = encoding.CODON_TO_AMINO_ACID[
+                self.codon_indices()
+            ]
+            if (amino_acid_indices == encoding.UNKNOWN).any():
+                raise NotImplementedError(
+                    "Amino acid could not be found, error: stop codon"
+                )
+            self._amino_acids = encoding.decode_amino_acids(amino_acid_indices)
+        return self._amino_acids
+
+    def to_template(self) -> Template:
+        return Template(self.nucleotides)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Size of the packed buffer region backing this template.
+        """
+        return -(-(self._start % 4 + self._length) // 4)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(
+        self, key: Union[int, slice]
+    ) -> Union[str, "PackedTemplate"]:
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self._length)
+            if step != 1:
+                raise ValueError("PackedTemplate slices must be contiguous")
+            sliced = PackedTemplate.__new__(PackedTemplate)
+            sliced._init(
+                self._buffer, self._start + start, max(stop - start, 0)
+            )
+            return sliced
+
+        if key < 0:
+            key += self._length
+        if not 0 <= key < self._length:
+            raise IndexError("template index out of range")
+        return self[key : key + 1].nucleotides
+
+    def __repr__(self):
+        return f"PackedTemplate({self.nucleotides})"
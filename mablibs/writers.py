@@ -0,0 +1,319 @@
+"""
+Module contains sinks that stream library records, as generated by
+Mutagenesis.generate_records, to FASTA, CSV/TSV or Parquet files.
+
+Records are formatted and written in chunks, so memory use does not grow
+with the library. Output can optionally be compressed and split into part
+files of a maximum size, named e.g. library.part00000.fasta.gz.
+"""
+
+import csv
+import gzip
+import io
+import pathlib
+from typing import Iterable, Iterator, List, Sequence, Union
+
+from mablibs.mutagenesis import LibraryRecord
+from mablibs.strategies import Mutation
+
+COLUMNS = ("rank", "mutations", "amino_acids", "nucleotides")
+COMPRESSION_SUFFIXES = {None: "", "gzip": ".gz", "zstd": ".zst"}
+
+Path = Union[str, pathlib.Path]
+
+
+def format_mutations(mutations: Sequence[Mutation]) -> str:
+    """
+    Formats mutations as position and residue pairs separated by ";", e.g.
+    ((0, 'A'), (2, 'D')) -> "0A;2D"
+    """
+    return ";".join(f"{position}{residue}" for position, residue in mutations)
+
+
+def _chunked(records: Iterable[LibraryRecord], size: int) -> Iterator[List]:
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _part_path(path: pathlib.Path, part: int) -> pathlib.Path:
+    stem, _, suffixes = path.name.partition(".")
+    return path.with_name(f"{stem}.part{part:05d}.{suffixes}".rstrip("."))
+
+
+def _open(path: pathlib.Path, compression: Union[None, str]):
+    if compression is None:
+        return open(path, "wb")
+    if compression == "gzip":
+        return gzip.open(path, "wb")
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError(
+                'zstd compression requires the "zstandard" package'
+            ) from e
+        return zstandard.ZstdCompressor().stream_writer(open(path, "wb"))
+    raise ValueError(f"unsupported compression {compression!r}")
+
+
+class _PartWriter:
+    """
+    Writes chunks of bytes to path, or to numbered part files of at most
+    max_part_bytes (uncompressed) each if max_part_bytes is given. A part
+    file is only split between chunks, and every part starts with header.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        compression: Union[None, str] = None,
+        max_part_bytes: Union[None, int] = None,
+        header: bytes = b"",
+    ) -> None:
+        self.path = pathlib.Path(path)
+        self.compression = compression
+        self.max_part_bytes = max_part_bytes
+        self.header = header
+        self.paths: List[pathlib.Path] = []
+        self._file = None
+        self._written = 0
+
+    def _next_part(self) -> None:
+        self.close()
+        if self.max_part_bytes is None:
+            path = self.path
+        else:
+            path = _part_path(self.path, len(self.paths))
+        self._file = _open(path, self.compression)
+        self.paths.append(path)
+        self._file.write(self.header)
+        self._written = len(self.header)
+
+    def write(self, data: bytes) -> None:
+        if self._file is None or (
+            self.max_part_bytes is not None
+            and self._written > len(self.header)
+            and self._written + len(data) > self.max_part_bytes
+        ):
+            self._next_part()
+        self._file.write(data)
+        self._written += len(data)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "_PartWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None and not self.paths:
+            # always create the output, even for an empty library
+            self._next_part()
+        self.close()
+
+
+def write_fasta(
+    records: Iterable[LibraryRecord],
+    path: Path,
+    compression: Union[None, str] = None,
+    chunk_size: int = 10_000,
+    max_part_bytes: Union[None, int] = None,
+) -> List[pathlib.Path]:
+    """
+    Writes records as FASTA, with the rank, mutations and amino acids in the
+    header of each nucleotide sequence, e.g.
+
+        >12 mutations=0A;2D amino_acids=ADDGS
+        GCTGATGATGGTTCT
+
+    Args:
+        records (Iterable[LibraryRecord]): records to write
+        path (Path): output path
+        compression (Union[None, str]): None, "gzip" or "zstd"
+        chunk_size (int): number of records formatted and written at a time
+        max_part_bytes (Union[None, int]): if given, output is split into
+        part files of at most this many uncompressed bytes
+
+    Returns:
+        List[pathlib.Path]: the files written
+    """
+    with _PartWriter(path, compression, max_part_bytes) as writer:
+        for chunk in _chunked(records, chunk_size):
+            writer.write(
+                "".join(
+                    f">{record.rank} "
+                    f"mutations={format_mutations(record.mutations)} "
+                    f"amino_acids={record.template.amino_acids}\n"
+                    f"{record.template.nucleotides}\n"
+                    for record in chunk
+                ).encode("ascii")
+            )
+    return writer.paths
+
+
+def write_delimited(
+    records: Iterable[LibraryRecord],
+    path: Path,
+    delimiter: str = ",",
+    compression: Union[None, str] = None,
+    chunk_size: int = 10_000,
+    max_part_bytes: Union[None, int] = None,
+) -> List[pathlib.Path]:
+    """
+    Writes records as CSV (or TSV with delimiter="\\t") with the columns in
+    COLUMNS and a header row in every part file. Takes the same arguments as
+    write_fasta.
+    """
+    header = io.StringIO()
+    csv.writer(header, delimiter=delimiter).writerow(COLUMNS)
+    with _PartWriter(
+        path, compression, max_part_bytes, header.getvalue().encode("ascii")
+    ) as writer:
+        for chunk in _chunked(records, chunk_size):
+            buffer = io.StringIO()
+            csv.writer(buffer, delimiter=delimiter).writerows(
+                (
+                    record.rank,
+                    format_mutations(record.mutations),
+                    record.template.amino_acids,
+                    record.template.nucleotides,
+                )
+                for record in chunk
+            )
+            writer.write(buffer.getvalue().encode("ascii"))
+    return writer.paths
+
+
+def write_parquet(
+    records: Iterable[LibraryRecord],
+    path: Path,
+    compression: Union[None, str] = "zstd",
+    chunk_size: int = 100_000,
+    max_part_bytes: Union[None, int] = None,
+) -> List[pathlib.Path]:
+    """
+    Writes records as Parquet with the columns in COLUMNS, one row group per
+    chunk. Mutations are stored as a list of (position, residue) structs.
+    Requires pyarrow.
+
+    Args:
+        records (Iterable[LibraryRecord]): records to write
+        path (Path): output path
+        compression (Union[None, str]): any Parquet compression codec
+        supported by pyarrow, e.g. "zstd", "gzip" or "snappy"
+        chunk_size (int): number of records per row group
+        max_part_bytes (Union[None, int]): if given, output is split into
+        part files holding at most this many bytes of uncompressed data
+
+    Returns:
+        List[pathlib.Path]: the files written
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError(
+            'writing parquet requires the "pyarrow" package'
+        ) from e
+
+    mutation_type = pa.list_(
+        pa.struct([("position", pa.int64()), ("residue", pa.string())])
+    )
+    schema = pa.schema(
+        [
+            ("rank", pa.uint64()),
+            ("mutations", mutation_type),
+            ("amino_acids", pa.string()),
+            ("nucleotides", pa.string()),
+        ]
+    )
+
+    path = pathlib.Path(path)
+    paths, writer, written = [], None, 0
+    try:
+        for chunk in _chunked(records, chunk_size):
+            table = pa.Table.from_pydict(
+                {
+                    "rank": [record.rank for record in chunk],
+                    "mutations": [
+                        [
+                            {"position": position, "residue": residue}
+                            for position, residue in record.mutations
+                        ]
+                        for record in chunk
+                    ],
+                    "amino_acids": [
+                        record.template.amino_acids for record in chunk
+                    ],
+                    "nucleotides": [
+                        record.template.nucleotides for record in chunk
+                    ],
+                },
+                schema=schema,
+            )
+            if writer is None or (
+                max_part_bytes is not None
+                and written
+                and written + table.nbytes > max_part_bytes
+            ):
+                if writer is not None:
+                    writer.close()
+                paths.append(
+                    path
+                    if max_part_bytes is None
+                    else _part_path(path, len(paths))
+                )
+                writer = pq.ParquetWriter(
+                    paths[-1], schema, compression=compression or "none"
+                )
+                written = 0
+            writer.write_table(table)
+            written += table.nbytes
+
+        if writer is None:
+            paths.append(path)
+            pq.write_table(schema.empty_table(), path)
+    finally:
+        if writer is not None:
+            writer.close()
+    return paths
+
+
+def write_records(
+    records: Iterable[LibraryRecord], path: Path, **kwargs
+) -> List[pathlib.Path]:
+    """
+    Writes records in the format and with the compression given by the
+    suffixes of path: .fasta/.fa/.fna, .csv, .tsv or .parquet, optionally
+    followed by .gz or .zst for the text formats. Other keyword arguments are
+    passed on to the format's writer.
+    """
+    suffixes = pathlib.Path(path).suffixes
+    compression = None
+    for name, suffix in COMPRESSION_SUFFIXES.items():
+        if name is not None and suffixes and suffixes[-1] == suffix:
+            compression = name
+            suffixes = suffixes[:-1]
+    kind = suffixes[-1] if suffixes else ""
+
+    if kind in (".fasta", ".fa", ".fna"):
+        return write_fasta(records, path, compression=compression, **kwargs)
+    if kind in (".csv", ".tsv"):
+        return write_delimited(
+            records,
+            path,
+            delimiter="\t" if kind == ".tsv" else ",",
+            compression=compression,
+            **kwargs,
+        )
+    if kind == ".parquet" and compression is None:
+        return write_parquet(records, path, **kwargs)
+    raise ValueError(f"cannot infer the output format of {path}")
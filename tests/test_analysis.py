@@ -0,0 +1,67 @@
+import collections
+import time
+
+import pytest
+from mablibs.analysis import *
+from mablibs.ptms import PTMChecker
+from mablibs.strategies import RandomizationStrategy
+
+
+@pytest.mark.parametrize(
+    "kinds",
+    [
+        None,
+        {"DEAMIDATION_MOTIF"},
+        {"GLYCOSYLATION_MOTIF", "DEAMIDATION_MOTIF", "CLEAVAGE_MOTIF"},
+    ],
+)
+@pytest.mark.parametrize("n", [1, 2, 4])
+def test_library_statistics(kinds, n) -> None:
+    parent = "ANGSTAPAKQA"
+    checker = None if kinds is None else PTMChecker(parent, kinds)
+    mapping = dict.fromkeys([1, 2, 3, 6, 9, 10], list("NGSPDA"))
+    strategy = RandomizationStrategy(mapping, n)
+
+    residue_counts = {position: collections.Counter() for position in mapping}
+    mutation_counts = [0] * (n + 1)
+    for mutations in strategy.get_mutations():
+        if checker is not None and checker.has_excluded_motif(mutations):
+            continue
+        variant = list(parent)
+        for position, residue in mutations:
+            variant[position] = residue
+        for position in mapping:
+            residue_counts[position][variant[position]] += 1
+        mutation_counts[sum(a != b for a, b in zip(variant, parent))] += 1
+
+    statistics = library_statistics(strategy, parent, checker)
+    assert statistics.size == strategy.size()
+    assert statistics.n_passing == sum(mutation_counts)
+    assert statistics.mutation_counts == mutation_counts
+    assert statistics.residue_counts == {
+        position: dict(counts) for position, counts in residue_counts.items()
+    }
+    if checker is not None:
+        assert count_passing(strategy, checker) == statistics.n_passing
+
+
+def test_library_statistics_large_library() -> None:
+    # no excluded motif outside the randomized positions 26-35
+    parent = "EVQLVESGGGLVQPGGSLRLSCAASGFNIKDTYIHWVRQAPGKGLEWVARIYPTQGYTRYAES"
+    checker = PTMChecker(
+        parent,
+        {"GLYCOSYLATION_MOTIF", "DEAMIDATION_MOTIF", "ISOMERIZATION_MOTIF"},
+    )
+    strategy = RandomizationStrategy(
+        dict.fromkeys(range(26, 36), "ACDEFGHIKLMNPQRSTVWY"), 10
+    )
+    start = time.perf_counter()
+    statistics = library_statistics(strategy, parent, checker)
+    elapsed = time.perf_counter() - start
+
+    assert statistics.size == 20**10 > 10**12
+    assert 0 < statistics.n_passing < statistics.size
+    assert sum(statistics.mutation_counts) == statistics.n_passing
+    for counts in statistics.residue_counts.values():
+        assert sum(counts.values()) == statistics.n_passing
+    assert elapsed < 1
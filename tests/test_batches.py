@@ -0,0 +1,113 @@
+import numpy as np
+import pytest
+from mablibs.batches import *
+from mablibs.codons import AA2CODON, CODON_FREQUENCIES
+from mablibs.optimization import (
+    NucleotideRepeatConstraint,
+    is_below_gc_content_threshold,
+)
+from mablibs.mutagenesis import Mutagenesis, get_preferred_codons
+from mablibs.strategies import RandomizationStrategy
+
+
+@pytest.fixture()
+def mutagenesis() -> Mutagenesis:
+    randomization = RandomizationStrategy(
+        {0: list("AN"), 2: list("DGS"), 3: list("W")}, 2
+    )
+    return Mutagenesis(randomization, Template("GCTGATAATGGTTCT"), "human")
+
+
+def test_get_residue_batches(mutagenesis) -> None:
+    randomization = mutagenesis.randomization_strategy
+    residue_batches = list(randomization.get_residue_batches(4))
+    assert [len(b) for b in residue_batches] == [4, 4, 3]
+    assert np.concatenate(residue_batches)[:3].tolist() == [
+        [0, 0, 255],
+        [0, 1, 255],
+        [0, 2, 255],
+    ]
+
+
+def test_mutate_batch(mutagenesis) -> None:
+    codon_matrices = list(mutagenesis.generate_batches(5))
+    templates = to_templates(np.concatenate(codon_matrices))
+    expected = [
+        mutagenesis.mutate(mutagenesis.template, mutations)
+        for mutations in mutagenesis.randomization_strategy.get_mutations()
+    ]
+    assert [t.nucleotides for t in templates] == [
+        t.nucleotides for t in expected
+    ]
+
+
+def test_translate_batch(mutagenesis) -> None:
+    codon_matrix = next(mutagenesis.generate_batches(2))
+    amino_acids = translate_batch(codon_matrix)
+    assert amino_acids.shape == codon_matrix.shape
+    assert [encoding.decode_amino_acids(row) for row in amino_acids] == [
+        "ADDGS",
+        "ADGGS",
+    ]
+
+
+def test_sequence_masks_match_constraints() -> None:
+    rng = np.random.default_rng(0)
+    # a small alphabet gives plenty of repeats
+    codon_matrix = rng.choice(
+        [encoding.CODON_INDEX[c] for c in ("AAA", "AAT", "ATA", "GCG", "CGC")],
+        size=(2000, 6),
+    ).astype(np.uint8)
+    nucleotide_matrix = to_nucleotide_matrix(codon_matrix)
+    sequences = [encoding.decode_codons(row) for row in codon_matrix]
+    assert [encoding.decode_nucleotides(r) for r in nucleotide_matrix] == (
+        sequences
+    )
+
+    repeats = NucleotideRepeatConstraint()
+    assert repeat_mask(nucleotide_matrix).tolist() == [
+        repeats(seq) for seq in sequences
+    ]
+    for threshold in (0.3, 0.5, 0.5555555555555556):
+        assert gc_content_mask(nucleotide_matrix, threshold).tolist() == [
+            is_below_gc_content_threshold(seq, threshold) for seq in sequences
+        ]
+
+
+@pytest.mark.parametrize("mode", REVERSE_TRANSLATION_MODES)
+def test_reverse_translate(mode) -> None:
+    sequences = ["MKVLAAGS", "", "WSSSSSSSSSSLY", "GG"]
+    nucleotides = reverse_translate(sequences, "human", mode, seed=0)
+    assert [Template(n).amino_acids for n in nucleotides] == sequences
+
+    matrix = encoding.encode_amino_acids("ACDEFGHIKL" * 3).reshape(3, 10)
+    codon_matrix = reverse_translate_batch(matrix, "e_coli", mode, seed=0)
+    assert codon_matrix.shape == (3, 10)
+    assert (translate_batch(codon_matrix) == matrix).all()
+
+
+def test_reverse_translate_modes() -> None:
+    preferred = get_preferred_codons("yeast")
+    assert reverse_translate(["MSSR"], "yeast") == [
+        "".join(preferred[aa] for aa in "MSSR")
+    ]
+
+    # harmonized codons follow usage within each sequence, weighted ones
+    # only on average
+    serines = reverse_translate(["S" * 1000], "human", "harmonized")[0]
+    codons = [serines[i : i + 3] for i in range(0, len(serines), 3)]
+    usage = CODON_FREQUENCIES["HUMAN"]
+    total = sum(usage[codon] for codon in AA2CODON["S"])
+    for codon in AA2CODON["S"]:
+        assert codons.count(codon) / 1000 == pytest.approx(
+            usage[codon] / total, abs=0.005
+        )
+    assert reverse_translate(["S" * 50] * 2, "human", "harmonized")[0] == (
+        serines[:150]
+    )
+    assert reverse_translate(["S" * 50], "human", "weighted", seed=1) == (
+        reverse_translate(["S" * 50], "human", "weighted", seed=1)
+    )
+
+    with pytest.raises(ValueError):
+        reverse_translate(["S"], "human", "first")
@@ -0,0 +1,62 @@
+import pytest
+from mablibs.cache import *
+from mablibs.optimization import (
+    DNAOptimizer,
+    GCContentConstraint,
+    RestrictionSiteConstraint,
+    is_not_palindromic,
+)
+
+
+@pytest.fixture()
+def optimizer():
+    return DNAOptimizer(
+        [RestrictionSiteConstraint("NheI"), is_not_palindromic],
+        "human",
+        seed=0,
+    )
+
+
+def test_constraint_fingerprint() -> None:
+    assert constraint_fingerprint(
+        [RestrictionSiteConstraint("NheI"), is_not_palindromic]
+    ) == (
+        "RestrictionSiteConstraint('NheI',);"
+        "mablibs.optimization.is_not_palindromic"
+    )
+    assert constraint_fingerprint(
+        [GCContentConstraint(0.5)]
+    ) != constraint_fingerprint([GCContentConstraint(0.6)])
+
+
+def test_optimization_cache_lru() -> None:
+    cache = OptimizationCache(maxsize=2)
+    cache.put("a", "AAA")
+    cache.put("b", "CCC")
+    assert cache.get("a") == "AAA"
+    cache.put("c", "GGG")
+    assert cache.get("b") is None
+    assert cache.get("a") == "AAA"
+    assert cache.info() == CacheInfo(2, 1, 0, 2, 2)
+
+
+def test_cached_optimizer(optimizer, tmp_path) -> None:
+    path = tmp_path / "cache.sqlite"
+    cached = CachedOptimizer(optimizer, OptimizationCache(path=path))
+    # GCT and GCC both encode alanine, so both templates share an entry
+    first = cached.optimize(Template("GCTAGCGCTAGCGCT"))
+    second = cached.optimize(Template("GCCAGCGCTAGCGCC"))
+    assert first.success and second.success
+    assert second.template.nucleotides == first.template.nucleotides
+    assert cached.cache.info()[:3] == (1, 1, 0)
+    cached.cache.close()
+
+    reopened = CachedOptimizer(optimizer, OptimizationCache(path=path))
+    result = reopened.optimize(Template("GCTAGCGCTAGCGCT"))
+    assert result.template.nucleotides == first.template.nucleotides
+    assert reopened.cache.info()[:3] == (1, 0, 1)
+
+    other_seed = DNAOptimizer(optimizer.constraints, "human", seed=1)
+    assert CachedOptimizer(other_seed).key(
+        Template("GCTAGCGCT")
+    ) != reopened.key(Template("GCTAGCGCT"))
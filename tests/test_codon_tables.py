@@ -0,0 +1,59 @@
+import random
+
+import numpy as np
+import pytest
+from mablibs.codon_tables import *
+from mablibs.codons import AA2CODON, CODON2AA, CODON_FREQUENCIES
+from mablibs.encoding import CODON_INDEX, CODONS
+
+
+@pytest.mark.parametrize("species", ["human", "e_coli"])
+def test_sample_follows_codon_usage(species) -> None:
+    table = get_codon_table(species)
+    rng = random.Random(0)
+    draws = [table.sample("CTG", rng) for _ in range(60_000)]
+
+    usage = CODON_FREQUENCIES[species.upper()]
+    total = sum(usage[codon] for codon in AA2CODON["L"])
+    for codon in AA2CODON["L"]:
+        assert draws.count(codon) / len(draws) == pytest.approx(
+            usage[codon] / total, abs=0.01
+        )
+
+
+def test_sample_batch_follows_codon_usage() -> None:
+    table = get_codon_table("human")
+    codon_indices = np.full((1_000, 60), CODON_INDEX["AGC"], dtype=np.uint8)
+    draws = table.sample_batch(codon_indices, np.random.default_rng(0))
+    assert draws.shape == codon_indices.shape
+
+    usage = CODON_FREQUENCIES["HUMAN"]
+    total = sum(usage[codon] for codon in AA2CODON["S"])
+    counts = np.bincount(draws.ravel(), minlength=len(CODONS))
+    for codon in AA2CODON["S"]:
+        assert counts[CODON_INDEX[codon]] / draws.size == pytest.approx(
+            usage[codon] / total, abs=0.01
+        )
+
+
+def test_sample_batch_is_synonymous() -> None:
+    table = get_codon_table("yeast")
+    codon_indices = np.arange(len(CODONS), dtype=np.uint8).repeat(50)
+    draws = table.sample_batch(codon_indices, np.random.default_rng(1))
+    for before, after in zip(codon_indices, draws):
+        before, after = CODONS[before], CODONS[after]
+        if before in CODON2AA:
+            assert CODON2AA[after] == CODON2AA[before]
+        else:
+            assert after == before
+
+
+def test_synonyms() -> None:
+    table = get_codon_table("HUMAN")
+    assert table is get_codon_table("human")
+    assert table.synonyms("ATG") == ("ATG",)
+    assert set(table.synonyms("GGC")) == set(AA2CODON["G"])
+    with pytest.raises(NotImplementedError):
+        table.synonyms("TAA")
+    with pytest.raises(NotImplementedError):
+        table.sample("TAA", random.Random())
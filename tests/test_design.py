@@ -0,0 +1,108 @@
+import itertools as it
+import math
+
+import pytest
+from mablibs.design import *
+from mablibs.codons import AA2CODON, CODON_FREQUENCIES
+from mablibs.mutagenesis import Mutagenesis
+from mablibs.optimization import is_not_palindromic
+from mablibs.scoring import cai
+from mablibs.strategies import RandomizationStrategy
+
+
+def brute_force(amino_acids, constraints, species):
+    usage = CODON_FREQUENCIES[species.upper()]
+    best, best_score = None, -math.inf
+    for codons in it.product(*(AA2CODON[aa] for aa in amino_acids)):
+        seq = "".join(codons)
+        score = sum(math.log(usage[codon]) for codon in codons)
+        if score > best_score and all(c(seq) for c in constraints):
+            best, best_score = seq, score
+    return best_score
+
+
+@pytest.mark.parametrize(
+    "amino_acids,constraints",
+    [
+        ("ASLEG", [RestrictionSiteConstraint("NheI", "XhoI", "AluI")]),
+        ("KKFFG", [NucleotideRepeatConstraint()]),
+        ("GARPS", [GCContentConstraint(0.55)]),
+        (
+            "LASGR",
+            [
+                RestrictionSiteConstraint("BsaI", "HaeIII", "MspI"),
+                NucleotideRepeatConstraint(),
+                GCContentConstraint(0.5),
+            ],
+        ),
+    ],
+)
+def test_design_is_optimal(amino_acids, constraints) -> None:
+    template = Template("".join(AA2CODON[aa][0] for aa in amino_acids))
+    result = CodonDesigner(constraints, "human").optimize(template)
+    assert result.success
+    seq = result.template.nucleotides
+    assert result.template.amino_acids == amino_acids
+    assert all(constraint(seq) for constraint in constraints)
+
+    usage = CODON_FREQUENCIES["HUMAN"]
+    score = sum(math.log(usage[seq[i : i + 3]]) for i in range(0, len(seq), 3))
+    assert score == pytest.approx(
+        brute_force(amino_acids, constraints, "human")
+    )
+
+
+def test_design_without_constraints_maximises_cai() -> None:
+    template = Template("GCTAGCCTCGAGGGCGGCGGCGGCGCCTAA")
+    designed = CodonDesigner([], "e_coli").optimize_template(template)
+    assert cai(designed, "e_coli") == pytest.approx(1)
+    assert designed.nucleotides.endswith("TAA")
+
+
+def test_design_infeasible() -> None:
+    template = Template("GGCGGCGGCGGC")
+    designer = CodonDesigner([GCContentConstraint(0.5)], "human")
+    assert designer.design(template.nucleotides) is None
+    result = designer.optimize(template)
+    assert not result.success
+    assert result.template is template
+    assert [constraint for constraint, _ in result.violations] == [
+        designer.constraints[0]
+    ]
+    with pytest.raises(OptimizationError):
+        designer.optimize_template(template)
+
+
+def avoids_cac(seq: str) -> bool:
+    return "CAC" not in seq
+
+
+def test_design_checks_other_constraints() -> None:
+    # plain functions are not part of the dynamic program, which picks the
+    # most frequent histidine codon
+    template = Template("ATGCATTGG")
+    designer = CodonDesigner([avoids_cac, is_not_palindromic], "human")
+    assert designer.checked_constraints == designer.constraints
+    result = designer.optimize(template)
+    assert result.template.nucleotides == "ATGCACTGG"
+    assert not result.success
+    assert result.violations == ((avoids_cac, ((0, 9),)),)
+
+
+def test_design_as_mutagenesis_optimizer() -> None:
+    template = Template("GCTAGCGATGGTTCTGCTAGC")
+    constraints = [RestrictionSiteConstraint("NheI"), GCContentConstraint(0.6)]
+    mutagenesis = Mutagenesis(
+        RandomizationStrategy(dict.fromkeys(range(2, 5), list("ADGS")), 2),
+        template,
+        "human",
+        optimizer=CodonDesigner(constraints, "human"),
+    )
+    library = list(mutagenesis.generate_library())
+    assert library
+    assert all(
+        constraint(t.nucleotides) for t in library for constraint in constraints
+    )
+    assert [t.nucleotides for t in mutagenesis.generate_library(workers=2)] == [
+        t.nucleotides for t in library
+    ]
@@ -0,0 +1,54 @@
+import json
+
+import pytest
+from mablibs.metrics import *
+from mablibs.mutagenesis import Mutagenesis
+from mablibs.optimization import DNAOptimizer, RestrictionSiteConstraint
+from mablibs.strategies import RandomizationStrategy
+from mablibs.templates import Template
+
+
+@pytest.mark.parametrize(
+    "iterations,bucket", [(0, 0), (1, 1), (3, 2), (4, 4), (1000, 512)]
+)
+def test_record_iterations(iterations, bucket) -> None:
+    metrics = PipelineMetrics()
+    metrics.record_iterations(iterations)
+    assert metrics.optimizer_iterations == {bucket: 1}
+
+
+def test_pipeline_metrics(tmp_path) -> None:
+    snapshots = []
+    metrics = PipelineMetrics(
+        callback=lambda m: snapshots.append(m.counters["generated"]),
+        callback_interval=0,
+    )
+    template = Template("GCTGATAATGGTTCTAGT")
+    optimizer = DNAOptimizer(
+        [RestrictionSiteConstraint("NheI")], "human", seed=0, metrics=metrics
+    )
+    mutagenesis = Mutagenesis(
+        RandomizationStrategy(dict.fromkeys(range(0, 6, 2), list("ANDGS")), 2),
+        template,
+        "human",
+        ptms_to_exclude={"DEAMIDATION_MOTIF", "GLYCOSYLATION_MOTIF"},
+        optimizer=optimizer,
+        sample_size=40,
+        metrics=metrics,
+    )
+    records = list(mutagenesis.generate_records())
+
+    counters = metrics.counters
+    assert counters["enumerated"] == 40
+    assert counters["generated"] == len(records)
+    assert counters["ptm_rejected"] + counters["optimized"] == 40
+    assert sum(metrics.ptm_rejections.values()) >= counters["ptm_rejected"]
+    assert sum(metrics.optimizer_iterations.values()) == counters["optimized"]
+    assert {"enumerate", "ptm_filter", "mutate", "optimize"} <= set(
+        metrics.timings
+    )
+    assert snapshots[-1] == len(records)
+
+    metrics.dump(tmp_path / "metrics.json")
+    dumped = json.loads((tmp_path / "metrics.json").read_text())
+    assert dumped["counters"]["generated"] == len(records)
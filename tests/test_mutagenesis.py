@@ -1,5 +1,9 @@
+import concurrent.futures
+
 import pytest
 from mablibs.mutagenesis import *
+from mablibs.optimization import DNAOptimizer, RestrictionSiteConstraint
+from mablibs.strategies import RandomizationStrategy
 
 
 @pytest.mark.parametrize(
@@ -8,3 +12,85 @@ from mablibs.mutagenesis import *
 )
 def test_get_preferred_codons(test_input, expected):
     get_preferred_codons(test_input)["F"] == expected
+
+
+@pytest.fixture()
+def mutagenesis():
+    template = Template("GCTGATAATGGTTCTAGT")
+    randomization = RandomizationStrategy(
+        dict.fromkeys(range(0, 6, 2), list("ANDGS")), 2
+    )
+    return Mutagenesis(
+        randomization,
+        template,
+        "human",
+        ptms_to_exclude={"DEAMIDATION_MOTIF", "GLYCOSYLATION_MOTIF"},
+    )
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_generate_library_parallel(mutagenesis, ordered):
+    expected = [t.nucleotides for t in mutagenesis.generate_library()]
+    parallel = [
+        t.nucleotides
+        for t in mutagenesis.generate_library(
+            workers=2, ordered=ordered, batch_size=4, max_pending=2
+        )
+    ]
+    with concurrent.futures.ThreadPoolExecutor(2) as executor:
+        threaded = [
+            t.nucleotides
+            for t in mutagenesis.generate_library(
+                executor=executor, ordered=ordered, batch_size=3
+            )
+        ]
+
+    if not ordered:
+        expected.sort()
+        parallel.sort()
+        threaded.sort()
+    assert parallel == expected
+    assert threaded == expected
+
+
+def test_generate_library_excludes_ptms(mutagenesis):
+    records = list(mutagenesis.generate_records())
+    assert all(
+        not mutagenesis.ptm_checker.has_excluded_motif(record.mutations)
+        for record in records
+    )
+    assert len(records) == mutagenesis.statistics().n_passing
+
+
+def test_generate_library_unique(mutagenesis):
+    mutagenesis.unique = True
+    amino_acids = [t.amino_acids for t in mutagenesis.generate_library()]
+    assert len(amino_acids) == len(set(amino_acids))
+    mutagenesis.unique = False
+    assert set(amino_acids) == {
+        t.amino_acids for t in mutagenesis.generate_library()
+    }
+
+
+def test_generate_library_seeded_parallel():
+    template = Template("GCTAGCGATGGTTCTGCTAGC")
+    randomization = RandomizationStrategy(
+        dict.fromkeys(range(2, 5), list("ADGS")), 2
+    )
+    optimizer = DNAOptimizer([RestrictionSiteConstraint("NheI")], "human")
+    mutagenesis = Mutagenesis(
+        randomization, template, "human", optimizer=optimizer, seed=3
+    )
+    expected = [t.nucleotides for t in mutagenesis.generate_library()]
+    assert len(set(expected)) > 1
+    assert [
+        t.nucleotides
+        for t in mutagenesis.generate_library(workers=2, batch_size=5)
+    ] == expected
+    with concurrent.futures.ThreadPoolExecutor(4) as executor:
+        assert [
+            t.nucleotides
+            for t in mutagenesis.generate_library(
+                executor=executor, batch_size=1
+            )
+        ] == expected
@@ -0,0 +1,136 @@
+import random
+
+import pytest
+from mablibs.optimization import *
+
+
+def random_sequence(rng: random.Random, n_codons: int) -> str:
+    return "".join(rng.choice(list(codons.CODON2AA)) for _ in range(n_codons))
+
+
+@pytest.mark.parametrize(
+    "constraint",
+    [
+        RestrictionSiteConstraint("NheI", "NotI", "XhoI", "AluI", "BslI"),
+        NucleotideRepeatConstraint(),
+        GCContentConstraint(0.5),
+        WindowedGCConstraint(20, 0.35, 0.6),
+        WindowedGCConstraint(500),
+    ],
+)
+def test_constraint_tracker_matches_full_check(constraint) -> None:
+    rng = random.Random(0)
+    seq = random_sequence(rng, 40)
+    tracker = constraint.track(seq)
+    for _ in range(300):
+        assert tracker.satisfied == constraint(seq)
+        start = 3 * rng.randrange(40)
+        replaced = seq[start : start + 3]
+        seq = seq[:start] + random_sequence(rng, 1) + seq[start + 3 :]
+        tracker.update(seq, start, start + 3, replaced)
+
+
+@pytest.mark.parametrize("threshold", [0.57, 0.29, 0.58])
+def test_gc_content_tracker_threshold_boundary(threshold) -> None:
+    # 57 / 100 <= 0.57 but 57 > 0.57 * 100 in floating point
+    seq = "G" * 57 + "A" * 43
+    constraint = GCContentConstraint(threshold)
+    assert constraint.track(seq).satisfied == constraint(seq)
+
+
+def test_constraints_match_functions() -> None:
+    rng = random.Random(1)
+    restriction_sites = RestrictionSiteConstraint("AluI", "MseI")
+    patterns = compile_restriction_site_regex("AluI", "MseI")
+    repeats = compile_nucleotide_repeat_regex()
+    for _ in range(200):
+        seq = random_sequence(rng, 10)
+        assert restriction_sites(seq) == pattern_not_found(seq, patterns)
+        assert NucleotideRepeatConstraint()(seq) == pattern_not_found(
+            seq, repeats
+        )
+
+
+def test_optimize_template() -> None:
+    constraints = [
+        RestrictionSiteConstraint("NheI", "XhoI"),
+        GCContentConstraint(0.6),
+        is_not_palindromic,
+    ]
+    optimizer = DNAOptimizer(constraints, "human")
+    template = optimizer.optimize_template(
+        Template("GCTAGCCTCGAGGGCGGCGGCGGCGCC")
+    )
+    assert all(constraint(template.nucleotides) for constraint in constraints)
+    assert template.amino_acids == "ASLEGGGGA"
+
+
+@pytest.mark.parametrize("seed", [1, 7, 42])
+def test_optimize_seeded(seed) -> None:
+    template = Template("GGTCTCAAAGAGACCAAA" * 3)
+    optimizer = DNAOptimizer([RestrictionSiteConstraint("BsaI")], "human", seed)
+    result = optimizer.optimize(template)
+    assert result.success
+    assert result.template.amino_acids == template.amino_acids
+    again = optimizer.optimize(template)
+    assert again.template.nucleotides == result.template.nucleotides
+
+
+def test_optimize_seed_override() -> None:
+    template = Template("GGTCTCAAAGAGACCAAA" * 3)
+    optimizer = DNAOptimizer([RestrictionSiteConstraint("BsaI")], "human", 1)
+    seeds = [variant_seed(5, "A" * i) for i in range(8)]
+    results = {
+        optimizer.optimize(template, s).template.nucleotides for s in seeds
+    }
+    assert len(results) > 1
+    assert (
+        optimizer.optimize(template, seeds[0]).template.nucleotides
+        == DNAOptimizer(optimizer.constraints, "human", seeds[0])
+        .optimize(template)
+        .template.nucleotides
+    )
+
+
+def test_local_gc_violations() -> None:
+    seq = "AT" * 10 + "GC" * 10 + "AT" * 10
+    windows = [seq[start : start + 10] for start in range(len(seq) - 9)]
+    expected = [
+        (start, start + 10)
+        for start, window in enumerate(windows)
+        if not 0.25 <= (window.count("G") + window.count("C")) / 10 <= 0.75
+    ]
+    assert expected and local_gc_violations(seq, 10, 0.25, 0.75) == expected
+    tracker = WindowedGCConstraint(10, 0.25, 0.75).track(seq)
+    assert tracker.violations() == [(0, 22), (18, 42), (38, 60)]
+    assert local_gc_violations("GC", 10) == [(0, 2)]
+    assert WindowedGCConstraint(10, 0.4, 0.6)("ATGC" * 10)
+
+
+def test_pattern_tracker_violations() -> None:
+    constraint = RestrictionSiteConstraint("NheI", "BsaI")
+    tracker = constraint.track("AAGCTAGCAAAGAGACCA")
+    assert sorted(tracker.violations()) == [(2, 8), (11, 17)]
+    assert NucleotideRepeatConstraint().track("CAAAACG").violations() == [
+        (1, 5)
+    ]
+
+
+def test_optimize_unsatisfiable() -> None:
+    # the ATG of methionine has no synonyms, so it cannot be removed
+    optimizer = DNAOptimizer([PatternConstraint("ATG", 3)], "human")
+    result = optimizer.optimize(Template("GCTATGGCT"))
+    assert not result.success
+    assert result.iterations == 0
+    assert result.violations[0][1] == ((3, 6),)
+    with pytest.raises(OptimizationError):
+        optimizer.optimize_template(Template("GCTATGGCT"))
+
+
+def test_optimize_max_iterations() -> None:
+    optimizer = DNAOptimizer(
+        [GCContentConstraint(0.0)], "human", max_iterations=25
+    )
+    result = optimizer.optimize(Template("GCTGCTGCT"))
+    assert not result.success
+    assert result.iterations == 25
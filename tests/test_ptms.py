@@ -0,0 +1,55 @@
+import itertools as it
+import random
+import re
+
+import pytest
+from mablibs.ptms import *
+
+
+def has_motif(seq, kinds) -> bool:
+    return any(
+        re.search(pattern, seq)
+        for kind, pattern in amino_acid_ptm_specification
+        if kind in kinds
+    )
+
+
+@pytest.mark.parametrize(
+    "kinds",
+    [
+        {"DEAMIDATION_MOTIF"},
+        {"GLYCOSYLATION_MOTIF", "CLEAVAGE_MOTIF"},
+        {kind for kind, _ in amino_acid_ptm_specification},
+    ],
+)
+def test_ptm_checker_matches_full_scan(kinds) -> None:
+    rng = random.Random(0)
+    for _ in range(100):
+        parent = "".join(rng.choice("NGSTDPAK") for _ in range(12))
+        checker = PTMChecker(parent, kinds)
+        positions = rng.sample(range(12), 3)
+        for residues in it.product("NGSDP", repeat=3):
+            mutations = tuple(zip(positions, residues))
+            variant = list(parent)
+            for position, residue in mutations:
+                variant[position] = residue
+            assert checker.has_excluded_motif(mutations) == has_motif(
+                "".join(variant), kinds
+            )
+
+
+def test_ptm_checker_parent_motifs() -> None:
+    checker = PTMChecker("ANGSA", {"DEAMIDATION_MOTIF", "GLYCOSYLATION_MOTIF"})
+    assert sorted(checker.parent_motifs) == [
+        PTMmotif("DEAMIDATION_MOTIF", "NG", 1, 3),
+        PTMmotif("GLYCOSYLATION_MOTIF", "NGS", 1, 4),
+    ]
+    assert checker.has_excluded_motif(((0, "A"),))
+    assert not checker.has_excluded_motif(((1, "Q"),))
+
+
+def test_ptm_checker_excluded_kinds() -> None:
+    checker = PTMChecker("ANGSA", {"DEAMIDATION_MOTIF", "CLEAVAGE_MOTIF"})
+    assert checker.excluded_kinds(()) == {"DEAMIDATION_MOTIF"}
+    assert checker.excluded_kinds(((1, "D"), (2, "P"))) == {"CLEAVAGE_MOTIF"}
+    assert checker.excluded_kinds(((1, "Q"),)) == set()
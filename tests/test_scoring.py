@@ -0,0 +1,71 @@
+import math
+import random
+
+import numpy as np
+import pytest
+from mablibs.scoring import *
+from mablibs.codons import AA2CODON, CODON2AA, CODON_FREQUENCIES
+from mablibs.mutagenesis import get_preferred_codons
+from mablibs.optimization import DNAOptimizer, RestrictionSiteConstraint
+
+
+def reference_cai(seq: str, species: str) -> float:
+    usage = CODON_FREQUENCIES[species.upper()]
+    log_weights = []
+    for i in range(0, len(seq), 3):
+        codon = seq[i : i + 3]
+        amino_acid = CODON2AA.get(codon)
+        if amino_acid is None or amino_acid in "MW":
+            continue
+        best = max(usage[synonym] for synonym in AA2CODON[amino_acid])
+        log_weights.append(math.log(usage[codon] / best))
+    return math.exp(sum(log_weights) / len(log_weights))
+
+
+@pytest.mark.parametrize("species", ["human", "e_coli"])
+def test_cai_matches_reference(species) -> None:
+    rng = random.Random(0)
+    sequences = [
+        "".join(rng.choice(list(CODON2AA)) for _ in range(30))
+        for _ in range(20)
+    ]
+    expected = [reference_cai(seq, species) for seq in sequences]
+    assert [cai(seq, species) for seq in sequences] == pytest.approx(expected)
+
+    codon_matrix = np.stack([encoding.encode_codons(s) for s in sequences])
+    assert cai_batch(codon_matrix, species) == pytest.approx(expected)
+
+
+def test_cai_bounds() -> None:
+    preferred = get_preferred_codons("yeast")
+    seq = "".join(preferred[aa] for aa in "QVQLVQSGAEVKK")
+    assert cai(Template(seq), "yeast") == pytest.approx(1)
+    # methionine, tryptophan and stop codons are not scored
+    assert cai("ATGTGGTAA", "yeast") == 1
+    assert cai(seq + "ATGTGGTAG", "yeast") == pytest.approx(1)
+    assert 0 < cai("CGACGA", "yeast") < 0.1
+
+
+def test_cai_constraint() -> None:
+    constraint = CAIConstraint("human", 0.9)
+    rng = random.Random(1)
+    seq = "".join(rng.choice(AA2CODON["L"]) for _ in range(20))
+    tracker = constraint.track(seq)
+    assert tracker.satisfied == (cai(seq, "human") >= 0.9)
+    for _ in range(100):
+        start = 3 * rng.randrange(20)
+        replaced = seq[start : start + 3]
+        seq = seq[:start] + rng.choice(AA2CODON["L"]) + seq[start + 3 :]
+        tracker.update(seq, start, start + 3, replaced)
+        assert math.exp(tracker.total / tracker.n_scored) == pytest.approx(
+            cai(seq, "human")
+        )
+
+    template = Template("CTAGCTAGCCTATTAGGCGCT")
+    optimizer = DNAOptimizer(
+        [RestrictionSiteConstraint("NheI"), constraint], "human", seed=0
+    )
+    result = optimizer.optimize_template(template)
+    assert result.amino_acids == template.amino_acids
+    assert cai(result, "human") >= 0.9
+    assert "GCTAGC" not in result.nucleotides
@@ -0,0 +1,68 @@
+import random
+import re
+
+import pytest
+from mablibs.sites import *
+
+
+@pytest.mark.parametrize(
+    "test_input,expected",
+    [
+        ("GCTAGC", [{"G"}, {"C"}, {"T"}, {"A"}, {"G"}, {"C"}]),
+        ("G[AG]N", [{"G"}, {"A", "G"}, {"A", "C", "G", "T"}]),
+        ("[^T]C.", [{"A", "C", "G"}, {"C"}, {"A", "C", "G", "T"}]),
+        ("RY", [{"A", "G"}, {"C", "T"}]),
+    ],
+)
+def test_parse_motif(test_input, expected) -> None:
+    assert parse_motif(test_input) == tuple(map(frozenset, expected))
+
+
+def test_site_scanner_finditer() -> None:
+    scanner = SiteScanner({"AluI": "AGCT", "CviKI-1": "[AG]GC[CT]"})
+    assert list(scanner.finditer("TAGCTGGCC")) == [
+        SiteMatch("AluI", 1, 5, "+"),
+        SiteMatch("CviKI-1", 1, 5, "+"),
+        SiteMatch("CviKI-1", 5, 9, "+"),
+    ]
+    assert list(scanner.finditer("TAGCTGGCC", 2)) == [
+        SiteMatch("CviKI-1", 5, 9, "+")
+    ]
+    assert scanner.search("AGNCT") is None
+
+
+def test_site_scanner_matches_regex() -> None:
+    names = ["NheI", "BslI", "XcmI", "AluI", "PspXI", "HinfI", "ApoI"]
+    scanner = SiteScanner.from_enzymes(*names, both_strands=False)
+    regexes = {
+        name: re.compile(f"(?=({enzymes.ENZYMES[name]}))") for name in names
+    }
+    rng = random.Random(0)
+    for _ in range(50):
+        seq = "".join(rng.choice("ACGT") for _ in range(300))
+        assert sorted(
+            (site.enzyme, site.start) for site in scanner.finditer(seq)
+        ) == sorted(
+            (name, mo.start())
+            for name, regex in regexes.items()
+            for mo in regex.finditer(seq)
+        )
+
+
+def test_is_self_complementary() -> None:
+    assert is_self_complementary("GAATTC")
+    assert is_self_complementary("GT[AC][GT]AC")
+    assert not is_self_complementary("GGTCTC")
+    assert SELF_COMPLEMENTARY["EcoRI"] and not SELF_COMPLEMENTARY["BsaI"]
+
+
+def test_site_scanner_both_strands() -> None:
+    scanner = SiteScanner.from_enzymes("BsaI", "EcoRI")
+    assert len(scanner.motifs) == 3
+    assert list(scanner.finditer("GGTCTCAAGAATTCGAGACC")) == [
+        SiteMatch("BsaI", 0, 6, "+"),
+        SiteMatch("EcoRI", 8, 14, "+"),
+        SiteMatch("BsaI", 14, 20, "-"),
+    ]
+    forward_only = SiteScanner.from_enzymes("BsaI", both_strands=False)
+    assert forward_only.search("GAGACC") is None
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from mablibs.mutagenesis import Mutagenesis, VariantFlag
+from mablibs.storage import *
+from mablibs.strategies import RandomizationStrategy
+from mablibs.templates import Template
+
+
+@pytest.fixture()
+def mutagenesis() -> Mutagenesis:
+    randomization = RandomizationStrategy(
+        dict.fromkeys(range(0, 6, 2), list("ANDGS")), 2
+    )
+    return Mutagenesis(
+        randomization,
+        Template("GCTGATAATGGTTCTAGT"),
+        "human",
+        ptms_to_exclude={"DEAMIDATION_MOTIF"},
+    )
+
+
+def test_write_library(mutagenesis, tmp_path) -> None:
+    path = tmp_path / "library.mablib"
+    write_library(path, mutagenesis, chunk_size=7)
+    library = LibraryFile(path)
+
+    assert len(library) == len(mutagenesis.randomization_strategy)
+    assert library.template.nucleotides == mutagenesis.template.nucleotides
+    assert library.ranks.tolist() == list(range(len(library)))
+    passing = library.select(clear_flags=VariantFlag.PTM_REJECTED)
+    assert [library.mutations(rank) for rank in passing] == [
+        record.mutations for record in mutagenesis.generate_records()
+    ]
+
+    entry = library[3]
+    assert entry.rank == 3
+    assert entry.mutations == mutagenesis.randomization_strategy[3]
+    assert isinstance(library[2:5], np.ndarray)
+    assert library[2:5]["rank"].tolist() == [2, 3, 4]
+
+
+def test_library_writer(mutagenesis, tmp_path) -> None:
+    path = tmp_path / "sample.mablib"
+    with LibraryWriter(
+        path, mutagenesis.randomization_strategy, mutagenesis.template
+    ) as writer:
+        writer.write([5, 9], VariantFlag.OPTIMIZED)
+    library = LibraryFile(path)
+    assert library.ranks.tolist() == [5, 9]
+    assert library.select(VariantFlag.OPTIMIZED).tolist() == [5, 9]
+    assert library.randomization_strategy.position_residue_mapping == (
+        mutagenesis.randomization_strategy.position_residue_mapping
+    )
+
+
+def test_library_file_rejects_other_files(tmp_path) -> None:
+    path = tmp_path / "library.fasta"
+    path.write_text(">0\nACGT\n")
+    with pytest.raises(ValueError):
+        LibraryFile(path)
@@ -76,12 +76,106 @@ def test_randomization_strategy_zip_keys_to_vals(
 def test_randomization_strategy_sample(position_residue_mapping) -> None:
     r = RandomizationStrategy(position_residue_mapping, n=2)
     assert list(r.sample(3, seed=42)) == [
-        ((1, "A"), (2, "D")),
-        ((1, "D"), (3, "D")),
-        ((2, "E"), (3, "C")),
+        ((1, "A"), (2, "E")),
+        ((1, "E"), (2, "D")),
+        ((3, "A"), (4, "C")),
     ]
 
 
+def test_randomization_strategy_sample_without_replacement(
+    position_residue_mapping,
+) -> None:
+    r = RandomizationStrategy(position_residue_mapping, n=2)
+    sample = list(r.sample(len(r), seed=1))
+    assert sample == list(r.get_mutations())
+    with pytest.raises(ValueError):
+        list(r.sample(len(r) + 1))
+
+
+@pytest.mark.parametrize("n", [1, 2, 3])
+def test_randomization_strategy_getitem(n) -> None:
+    r = RandomizationStrategy({0: ["A", "C"], 3: ["D"], 5: ["E", "F", "G"]}, n)
+    mutations = list(r.get_mutations())
+    assert [r[i] for i in range(len(r))] == mutations
+    assert r[-1] == mutations[-1]
+    with pytest.raises(IndexError):
+        r[len(r)]
+
+
+def test_randomization_strategy_size_exceeds_maxsize() -> None:
+    r = RandomizationStrategy(dict.fromkeys(range(30), list("ACDEFGHIKLMN")))
+    assert r.size() == 12**30
+    assert r[r.size() - 1] == tuple((i, "N") for i in range(30))
+
+
 def test_randomization_strategymul_lens(position_residue_mapping) -> None:
     r = RandomizationStrategy(position_residue_mapping, n=2)
     assert r.mul_lens([[1, 2, 3], [4, 5, 6], [7, 8, 9]]) == 27
+
+
+@pytest.mark.parametrize("n", [1, 2, 3])
+def test_randomization_strategy_ranges(n) -> None:
+    r = RandomizationStrategy({0: ["A", "C"], 3: ["D"], 5: ["E", "F", "G"]}, n)
+    mutations = list(r.get_mutations())
+    for start in range(len(r)):
+        for stop in (start + 1, start + 4, len(r) + 1):
+            assert list(r.ranges(start, stop)) == mutations[start:stop]
+
+
+@pytest.mark.parametrize("num_shards", [1, 3, 7, 200])
+def test_randomization_strategy_get_mutations_sharded(
+    position_residue_mapping, num_shards
+) -> None:
+    r = RandomizationStrategy(position_residue_mapping, 2)
+    shards = [
+        list(r.get_mutations(shard=i, num_shards=num_shards))
+        for i in range(num_shards)
+    ]
+    assert list(it.chain.from_iterable(shards)) == list(r.get_mutations())
+    with pytest.raises(ValueError):
+        r.get_mutations(shard=num_shards, num_shards=num_shards)
+
+
+@pytest.mark.parametrize("n", [1, 2, 3])
+def test_randomization_strategy_ptm_pruning(n) -> None:
+    checker = PTMChecker(
+        "ANGSTAPAKQA",
+        {"GLYCOSYLATION_MOTIF", "DEAMIDATION_MOTIF", "CLEAVAGE_MOTIF"},
+    )
+    mapping = dict.fromkeys([1, 2, 3, 6, 9, 10], list("NGSPDA"))
+    unfiltered = RandomizationStrategy(mapping, n)
+    expected = [
+        (rank, mutations)
+        for rank, mutations in enumerate(unfiltered.get_mutations())
+        if not checker.has_excluded_motif(mutations)
+    ]
+
+    randomization = RandomizationStrategy(mapping, n, ptm_checker=checker)
+    assert list(randomization.iter_passing()) == expected
+    assert list(randomization.get_mutations()) == [m for _, m in expected]
+    start, stop = randomization.shard_bounds(1, 3)
+    assert list(randomization.get_mutations(1, 3)) == [
+        mutations for rank, mutations in expected if start <= rank < stop
+    ]
+    assert randomization.n_passing() == len(expected)
+
+
+@pytest.mark.parametrize("n", [1, 2, 3, 4])
+def test_randomization_strategy_unique(n) -> None:
+    parent = "ACDEFGH"
+    mapping = {1: list("ACD"), 2: list("DK"), 4: list("AG"), 5: list("GFS")}
+    r = RandomizationStrategy(mapping, n)
+
+    def sequence(mutations):
+        variant = list(parent)
+        for position, residue in mutations:
+            variant[position] = residue
+        return "".join(variant)
+
+    unique = list(r.iter_unique(parent))
+    sequences = [sequence(mutations) for _, mutations in unique]
+    assert len(set(sequences)) == len(sequences)
+    assert set(sequences) == {sequence(m) for m in r.get_mutations()}
+    assert [rank for rank, _ in unique] == sorted(rank for rank, _ in unique)
+    assert all(r[rank] == mutations for rank, mutations in unique)
+    assert r.n_unique(parent) == len(unique)
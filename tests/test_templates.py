@@ -0,0 +1,31 @@
+import pytest
+from mablibs.templates import *
+
+
+@pytest.fixture()
+def nucleotides() -> str:
+    return "ATGGCTTTTGGGAAC"
+
+
+def test_packed_template(nucleotides) -> None:
+    packed = PackedTemplate(nucleotides)
+    template = Template(nucleotides)
+    assert packed.nucleotides == nucleotides
+    assert packed.codons() == template.codons()
+    assert packed.amino_acids == template.amino_acids == "MAFGN"
+    assert packed.nbytes == 4
+    assert len(packed) == len(nucleotides)
+
+
+@pytest.mark.parametrize("start,stop", [(0, 15), (3, 9), (1, 14), (5, 6)])
+def test_packed_template_slice(nucleotides, start, stop) -> None:
+    packed = PackedTemplate(nucleotides)
+    sliced = packed[start:stop]
+    assert sliced._buffer is packed._buffer
+    assert sliced.nucleotides == nucleotides[start:stop]
+    assert sliced.codons() == Template(nucleotides[start:stop]).codons()
+
+
+def test_packed_template_rejects_ambiguous_bases() -> None:
+    with pytest.raises(ValueError):
+        PackedTemplate("ATGNNN")
@@ -0,0 +1,68 @@
+import csv
+import gzip
+
+import pytest
+from mablibs.mutagenesis import Mutagenesis
+from mablibs.strategies import RandomizationStrategy
+from mablibs.templates import Template
+from mablibs.writers import *
+
+
+@pytest.fixture()
+def records():
+    randomization = RandomizationStrategy(
+        dict.fromkeys(range(0, 6, 2), list("ADG")), 2
+    )
+    mutagenesis = Mutagenesis(
+        randomization, Template("GCTGATAATGGTTCT"), "human"
+    )
+    return list(mutagenesis.generate_records())
+
+
+def test_format_mutations() -> None:
+    assert format_mutations(((0, "A"), (12, "D"))) == "0A;12D"
+
+
+def test_write_fasta(records, tmp_path) -> None:
+    paths = write_fasta(iter(records), tmp_path / "library.fasta.gz", "gzip")
+    assert paths == [tmp_path / "library.fasta.gz"]
+    with gzip.open(paths[0], "rt") as f:
+        lines = f.read().splitlines()
+    assert lines[:2] == [
+        ">0 mutations=0A;2A amino_acids=ADAGS",
+        "GCCGATGCCGGTTCT",
+    ]
+    assert len(lines) == 2 * len(records)
+
+
+def test_write_delimited_parts(records, tmp_path) -> None:
+    paths = write_records(
+        iter(records),
+        tmp_path / "library.tsv",
+        chunk_size=5,
+        max_part_bytes=300,
+    )
+    assert len(paths) > 1
+    assert paths[0] == tmp_path / "library.part00000.tsv"
+    rows = []
+    for path in paths:
+        with open(path) as f:
+            part = list(csv.reader(f, delimiter="\t"))
+        assert part[0] == list(COLUMNS)
+        assert path.stat().st_size <= 300
+        rows.extend(part[1:])
+    assert [int(row[0]) for row in rows] == [r.rank for r in records]
+    assert rows[0][1:] == ["0A;2A", "ADAGS", "GCCGATGCCGGTTCT"]
+
+
+def test_write_parquet(records, tmp_path) -> None:
+    pq = pytest.importorskip("pyarrow.parquet")
+    paths = write_records(
+        iter(records), tmp_path / "library.parquet", chunk_size=10
+    )
+    table = pq.read_table(paths[0])
+    assert table.num_rows == len(records)
+    assert table.column("mutations")[0].as_py() == [
+        {"position": 0, "residue": "A"},
+        {"position": 2, "residue": "A"},
+    ]